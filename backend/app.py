@@ -2,28 +2,62 @@
 API FastAPI para Sistema de Gestão Escolar
 Implementa endpoints REST para gerenciar alunos, turmas e matrículas com autenticação
 """
-from fastapi import FastAPI, Depends, HTTPException, Query, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer
+from fastapi.responses import PlainTextResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, field_validator, Field
 from typing import Optional, List
 import datetime
+import json
 import re
 
 # Importações locais
-from database import SessionLocal, engine, get_db
-from models import Base, Aluno, Turma, Usuario
+from migracoes import aplicar_migracoes
+from database import (
+    SessionLocal,
+    engine,
+    get_db,
+    sessao_compartilhada,
+    escola_atual,
+    cache_engines,
+    MULTI_ESCOLA,
+    ESCOLAS_AQUECER
+)
+from models import Aluno, Turma, Usuario
 from auth import (
     criar_hash_senha, 
     criar_access_token, 
     autenticar_usuario, 
     obter_usuario_atual,
-    usuario_ativo_required
+    usuario_ativo_required,
+    usuario_admin_required,
+    revogar_access_token,
+    security,
+    usuario_compartilhado,
+    USERNAMES_RESERVADOS
+)
+from buffer_login import buffer_ultimo_login
+import consultas
+from revogacao import revogacao_tokens
+from batch import executar_subrequisicao, BATCH_MAX_REQUISICOES
+from jobs import fila_jobs, submeter_job, buscar_job, exige_admin
+from backup import listar_backups
+from arquivo import estatisticas_arquivo
+from duplicados import buscar_possiveis_duplicados
+from limitador import LimitadorRequisicoes, orcamento_subrequisicao
+from escolas import EscolaMiddleware
+from idempotencia import IdempotenciaMiddleware
+from compressao import CompressaoMiddleware
+from snapshot_alunos import snapshot_alunos, SNAPSHOT_ALUNOS_ATIVO
+from profiler import (
+    ProfilerRequisicoesMiddleware,
+    capturar_perfil,
+    formatar_colapsado,
+    perfis_lentos,
+    PROFILER_DURACAO_MAXIMA
 )
-
-# Criação das tabelas no banco de dados
-Base.metadata.create_all(bind=engine)
 
 # Inicialização da aplicação FastAPI
 app = FastAPI(
@@ -32,6 +66,19 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Profiling amostrado de uma fração das requisições (desligado por padrão)
+app.add_middleware(ProfilerRequisicoesMiddleware)
+
+# Idempotency-Key nos POSTs de criação (dentro do EscolaMiddleware, usa o banco da escola)
+app.add_middleware(IdempotenciaMiddleware)
+
+# Escola da requisição no modo multi-escola (define o banco usado por get_db)
+app.add_middleware(EscolaMiddleware)
+
+# Controle de admissão e limite de requisições por cliente
+# Registrado antes do CORS para que as respostas 429/503 também recebam os cabeçalhos CORS
+app.add_middleware(LimitadorRequisicoes)
+
 # Configuração CORS para permitir requisições do frontend
 app.add_middleware(
     CORSMiddleware,
@@ -41,6 +88,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão gzip/brotli com ETag (middleware mais externo, comprime a resposta final)
+app.add_middleware(CompressaoMiddleware)
+
+# === CICLO DE VIDA ===
+
+@app.on_event("startup")
+def iniciar_servicos():
+    """
+    Inicia as tarefas em segundo plano da aplicação
+    """
+    # Verificação rápida da versão do esquema (migra apenas se houver pendências)
+    aplicar_migracoes(engine)
+    buffer_ultimo_login.iniciar()
+    revogacao_tokens.iniciar()
+    fila_jobs.iniciar()
+    if MULTI_ESCOLA:
+        cache_engines.aquecer(ESCOLAS_AQUECER)
+    if SNAPSHOT_ALUNOS_ATIVO:
+        snapshot_alunos.carregar()
+        print(f"Snapshot de alunos: {snapshot_alunos.estatisticas()}")
+
+@app.on_event("shutdown")
+def encerrar_servicos():
+    """
+    Encerra as tarefas em segundo plano gravando o que estiver pendente
+    """
+    fila_jobs.parar()
+    buffer_ultimo_login.parar()
+    revogacao_tokens.parar()
+    cache_engines.fechar_todos()
+
 # === SCHEMAS PYDANTIC ===
 # Modelos para validação de entrada e saída da API
 
@@ -124,9 +202,21 @@ class AlunoResponse(AlunoBase):
     id: int
     idade: int = 0  # Será calculado dinamicamente
     turma_nome: Optional[str] = None  # Nome da turma
+    arquivado: bool = False  # Vem do arquivo de alunos inativos
     
     model_config = {"from_attributes": True}
 
+class PossivelDuplicado(BaseModel):
+    """Schema de um aluno já cadastrado parecido com o novo"""
+    id: int
+    nome: str
+    data_nascimento: datetime.date
+    similaridade: float
+
+class AlunoCriadoResponse(AlunoResponse):
+    """Schema para resposta da criação de aluno, com o aviso de possíveis duplicados"""
+    possiveis_duplicados: List[PossivelDuplicado] = []
+
 class MatriculaRequest(BaseModel):
     """Schema para solicitação de matrícula"""
     aluno_id: int = Field(..., description="ID do aluno")
@@ -156,6 +246,7 @@ class UsuarioResponse(BaseModel):
     email: str
     nome_completo: str
     ativo: bool
+    admin: bool = False
     data_criacao: datetime.datetime
     ultimo_login: Optional[datetime.datetime] = None
     
@@ -172,6 +263,39 @@ class TokenResponse(BaseModel):
     token_type: str
     usuario: UsuarioResponse
 
+# === SCHEMAS DE BATCH ===
+
+class SubRequisicao(BaseModel):
+    """Schema para uma sub-requisição de leitura dentro de um batch"""
+    id: Optional[str] = Field(None, max_length=50, description="Identificador livre devolvido na resposta")
+    metodo: str = Field("GET", pattern="^GET$", description="Apenas GET (leitura)")
+    url: str = Field(..., pattern="^/", max_length=500, description="Caminho com query string, ex.: /alunos?status=ativo")
+
+class BatchRequest(BaseModel):
+    """Schema para requisição de batch"""
+    requisicoes: List[SubRequisicao] = Field(..., min_length=1, max_length=BATCH_MAX_REQUISICOES)
+
+# === SCHEMAS DE JOBS ===
+
+class JobCreate(BaseModel):
+    """Schema para submissão de job"""
+    tipo: str = Field(..., max_length=50, description="Tipo do job (ex.: estatisticas, exportar_alunos)")
+    parametros: dict = Field(default_factory=dict, description="Parâmetros do job")
+    chave_idempotencia: Optional[str] = Field(None, max_length=100, description="Evita submissões duplicadas")
+
+class JobResponse(BaseModel):
+    """Schema para resposta com o estado de um job"""
+    id: int
+    tipo: str
+    status: str
+    progresso: int
+    erro: Optional[str] = None
+    tentativas: int
+    criado_em: datetime.datetime
+    atualizado_em: datetime.datetime
+    
+    model_config = {"from_attributes": True}
+
 # === ENDPOINTS ===
 
 @app.get("/", tags=["Root"])
@@ -195,8 +319,15 @@ def registrar_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
     """
     Registra um novo usuário no sistema
     """
+    # Usernames administrativos só podem ser criados pelo criar_admin.py
+    if usuario.username.lower() in USERNAMES_RESERVADOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username reservado"
+        )
+    
     # Verifica se o username já existe
-    db_usuario = db.query(Usuario).filter(Usuario.username == usuario.username).first()
+    db_usuario = consultas.usuario_por_username(db, usuario.username)
     if db_usuario:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -204,7 +335,7 @@ def registrar_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
         )
     
     # Verifica se o email já existe
-    db_email = db.query(Usuario).filter(Usuario.email == usuario.email).first()
+    db_email = consultas.usuario_por_email(db, usuario.email)
     if db_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -247,12 +378,17 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
             detail="Usuário inativo"
         )
     
-    # Atualiza o último login
-    usuario.ultimo_login = datetime.datetime.utcnow()
-    db.commit()
+    # Atualiza o último login (gravado em lote pelo buffer, sem commit por login)
+    agora = datetime.datetime.utcnow()
+    db.expunge(usuario)
+    usuario.ultimo_login = agora
+    buffer_ultimo_login.registrar(usuario.id, agora)
     
-    # Cria o token JWT
-    access_token = criar_access_token(data={"sub": usuario.username})
+    # Cria o token JWT (no modo multi-escola o token vale apenas para a escola do login)
+    dados_token = {"sub": usuario.username}
+    if escola_atual.get() is not None:
+        dados_token["escola"] = escola_atual.get()
+    access_token = criar_access_token(data=dados_token)
     
     return {
         "access_token": access_token,
@@ -265,13 +401,21 @@ def obter_perfil(usuario: Usuario = Depends(obter_usuario_atual)):
     """
     Retorna o perfil do usuário autenticado
     """
+    # Considera um login ainda não gravado pelo buffer
+    pendente = buffer_ultimo_login.pendente(usuario.id)
+    if pendente is not None:
+        return UsuarioResponse.model_validate(usuario).model_copy(update={"ultimo_login": pendente})
     return usuario
 
 @app.post("/auth/logout", tags=["Autenticação"])
-def logout(usuario: Usuario = Depends(obter_usuario_atual)):
+def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    usuario: Usuario = Depends(obter_usuario_atual)
+):
     """
-    Faz logout do usuário (endpoint informativo, token deve ser removido no frontend)
+    Faz logout do usuário revogando o token atual até sua expiração
     """
+    revogar_access_token(credentials.credentials)
     return {"message": "Logout realizado com sucesso"}
 
 # === ENDPOINTS DE TURMAS ===
@@ -281,20 +425,16 @@ def listar_turmas(db: Session = Depends(get_db)):
     """
     Lista todas as turmas com informação de ocupação
     """
-    turmas = db.query(Turma).all()
+    turmas = consultas.listar_turmas(db)
+    ocupacoes = consultas.ocupacao_por_turma(db)  # Uma única consulta agrupada
     resultado = []
     
     for turma in turmas:
-        ocupacao = db.query(Aluno).filter(
-            Aluno.turma_id == turma.id,
-            Aluno.status == "ativo"
-        ).count()
-        
         turma_dict = {
             "id": turma.id,
             "nome": turma.nome,
             "capacidade": turma.capacidade,
-            "ocupacao": ocupacao
+            "ocupacao": ocupacoes.get(turma.id, 0)
         }
         resultado.append(turma_dict)
     
@@ -306,7 +446,7 @@ def criar_turma(turma: TurmaCreate, db: Session = Depends(get_db)):
     Cria uma nova turma
     """
     # Verifica se já existe turma com mesmo nome
-    turma_existente = db.query(Turma).filter(Turma.nome == turma.nome).first()
+    turma_existente = consultas.turma_por_nome(db, turma.nome)
     if turma_existente:
         raise HTTPException(status_code=400, detail="Turma com este nome já existe")
     
@@ -314,6 +454,7 @@ def criar_turma(turma: TurmaCreate, db: Session = Depends(get_db)):
     db.add(db_turma)
     db.commit()
     db.refresh(db_turma)
+    snapshot_alunos.registrar_turma(db_turma.id, db_turma.nome)
     
     return {
         "id": db_turma.id,
@@ -329,24 +470,20 @@ def listar_alunos(
     search: Optional[str] = Query(None, description="Busca por nome"),
     turma_id: Optional[int] = Query(None, description="Filtro por turma"),
     status: Optional[str] = Query(None, description="Filtro por status"),
+    incluir_arquivo: bool = Query(False, description="Inclui os alunos arquivados"),
     db: Session = Depends(get_db)
 ):
     """
     Lista alunos com filtros opcionais por nome, turma e status
     """
-    query = db.query(Aluno)
-    
-    # Aplicar filtros
-    if search:
-        query = query.filter(Aluno.nome.ilike(f"%{search}%"))
-    
-    if turma_id:
-        query = query.filter(Aluno.turma_id == turma_id)
-    
-    if status:
-        query = query.filter(Aluno.status == status)
-    
-    alunos = query.all()
+    # Com o snapshot em memória ativo, os filtros não consultam o banco
+    if snapshot_alunos.ativo:
+        resultado = snapshot_alunos.filtrar(search, turma_id, status)
+        if incluir_arquivo:
+            resultado = resultado + _alunos_arquivados(db, search, turma_id, status)
+        return resultado
+    
+    alunos = consultas.listar_alunos(db, search, turma_id, status)
     resultado = []
     
     for aluno in alunos:
@@ -366,9 +503,31 @@ def listar_alunos(
         }
         resultado.append(aluno_dict)
     
+    if incluir_arquivo:
+        resultado.extend(_alunos_arquivados(db, search, turma_id, status))
+    
     return resultado
 
-@app.post("/alunos", response_model=AlunoResponse, status_code=201, tags=["Alunos"])
+def _alunos_arquivados(db: Session, search, turma_id, status) -> List[dict]:
+    """
+    Alunos do arquivo no mesmo formato da listagem (id é o id original do aluno)
+    """
+    return [
+        {
+            "id": aluno.aluno_id,
+            "nome": aluno.nome,
+            "data_nascimento": aluno.data_nascimento,
+            "email": aluno.email,
+            "status": aluno.status,
+            "turma_id": aluno.turma_id,
+            "idade": aluno.idade,
+            "turma_nome": None,
+            "arquivado": True
+        }
+        for aluno in consultas.listar_arquivados(db, search, turma_id, status)
+    ]
+
+@app.post("/alunos", response_model=AlunoCriadoResponse, status_code=201, tags=["Alunos"])
 def criar_aluno(
     aluno: AlunoCreate, 
     db: Session = Depends(get_db),
@@ -379,20 +538,24 @@ def criar_aluno(
     """
     # Verifica se email já existe (se fornecido)
     if aluno.email:
-        aluno_existente = db.query(Aluno).filter(Aluno.email == aluno.email).first()
+        aluno_existente = consultas.aluno_por_email(db, aluno.email)
         if aluno_existente:
             raise HTTPException(status_code=400, detail="Email já cadastrado")
     
     # Verifica se turma existe (se fornecida)
     if aluno.turma_id:
-        turma = db.query(Turma).filter(Turma.id == aluno.turma_id).first()
+        turma = db.get(Turma, aluno.turma_id)
         if not turma:
             raise HTTPException(status_code=404, detail="Turma não encontrada")
     
+    # Aviso (não bloqueia): alunos com a mesma data de nascimento e nome parecido
+    possiveis_duplicados = buscar_possiveis_duplicados(db, aluno.nome, aluno.data_nascimento)
+    
     db_aluno = Aluno(**aluno.dict())
     db.add(db_aluno)
     db.commit()
     db.refresh(db_aluno)
+    snapshot_alunos.registrar_aluno(db_aluno)
     
     turma_nome = None
     if db_aluno.turma:
@@ -406,7 +569,8 @@ def criar_aluno(
         "status": db_aluno.status,
         "turma_id": db_aluno.turma_id,
         "idade": db_aluno.idade,
-        "turma_nome": turma_nome
+        "turma_nome": turma_nome,
+        "possiveis_duplicados": possiveis_duplicados
     }
 
 @app.put("/alunos/{aluno_id}", response_model=AlunoResponse, tags=["Alunos"])
@@ -414,19 +578,19 @@ def atualizar_aluno(aluno_id: int, aluno: AlunoUpdate, db: Session = Depends(get
     """
     Atualiza dados de um aluno existente
     """
-    db_aluno = db.query(Aluno).filter(Aluno.id == aluno_id).first()
+    db_aluno = db.get(Aluno, aluno_id)
     if not db_aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
     
     # Verifica email único (se alterado)
     if aluno.email and aluno.email != db_aluno.email:
-        aluno_existente = db.query(Aluno).filter(Aluno.email == aluno.email).first()
+        aluno_existente = consultas.aluno_por_email(db, aluno.email)
         if aluno_existente:
             raise HTTPException(status_code=400, detail="Email já cadastrado")
     
     # Verifica se turma existe (se fornecida)
     if aluno.turma_id:
-        turma = db.query(Turma).filter(Turma.id == aluno.turma_id).first()
+        turma = db.get(Turma, aluno.turma_id)
         if not turma:
             raise HTTPException(status_code=404, detail="Turma não encontrada")
     
@@ -437,6 +601,7 @@ def atualizar_aluno(aluno_id: int, aluno: AlunoUpdate, db: Session = Depends(get
     
     db.commit()
     db.refresh(db_aluno)
+    snapshot_alunos.registrar_aluno(db_aluno)
     
     turma_nome = None
     if db_aluno.turma:
@@ -458,12 +623,13 @@ def excluir_aluno(aluno_id: int, db: Session = Depends(get_db)):
     """
     Exclui um aluno
     """
-    db_aluno = db.query(Aluno).filter(Aluno.id == aluno_id).first()
+    db_aluno = db.get(Aluno, aluno_id)
     if not db_aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
     
     db.delete(db_aluno)
     db.commit()
+    snapshot_alunos.remover_aluno(aluno_id)
     
     return {"message": "Aluno excluído com sucesso"}
 
@@ -476,20 +642,17 @@ def matricular_aluno(matricula: MatriculaRequest, db: Session = Depends(get_db))
     Valida capacidade e altera status para ativo
     """
     # Busca aluno
-    aluno = db.query(Aluno).filter(Aluno.id == matricula.aluno_id).first()
+    aluno = db.get(Aluno, matricula.aluno_id)
     if not aluno:
         raise HTTPException(status_code=404, detail="Aluno não encontrado")
     
     # Busca turma
-    turma = db.query(Turma).filter(Turma.id == matricula.turma_id).first()
+    turma = db.get(Turma, matricula.turma_id)
     if not turma:
         raise HTTPException(status_code=404, detail="Turma não encontrada")
     
     # Verifica capacidade da turma
-    ocupacao_atual = db.query(Aluno).filter(
-        Aluno.turma_id == turma.id,
-        Aluno.status == "ativo"
-    ).count()
+    ocupacao_atual = consultas.ocupacao_turma(db, turma.id)
     
     if ocupacao_atual >= turma.capacidade:
         raise HTTPException(
@@ -502,6 +665,7 @@ def matricular_aluno(matricula: MatriculaRequest, db: Session = Depends(get_db))
     aluno.status = "ativo"  # Altera status automaticamente
     
     db.commit()
+    snapshot_alunos.registrar_aluno(aluno)
     
     return {
         "message": f"Aluno '{aluno.nome}' matriculado na turma '{turma.nome}' com sucesso",
@@ -510,6 +674,172 @@ def matricular_aluno(matricula: MatriculaRequest, db: Session = Depends(get_db))
         "novo_status": aluno.status
     }
 
+# === ENDPOINT DE BATCH ===
+
+@app.post("/batch", tags=["Batch"])
+async def executar_batch(
+    batch: BatchRequest,
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    usuario: Usuario = Depends(obter_usuario_atual),
+    db: Session = Depends(get_db)
+):
+    """
+    Executa várias requisições GET em uma única ida e volta
+    Todas compartilham a autenticação e a sessão de banco do batch
+    """
+    token_sessao = sessao_compartilhada.set(db)
+    token_usuario = usuario_compartilhado.set((credentials.credentials, usuario))
+    try:
+        respostas = []
+        for sub in batch.requisicoes:
+            caminho = sub.url.split("?")[0]
+            if caminho.rstrip("/") == "/batch":
+                resposta = {"status": 400, "body": {"detail": "Batch aninhado não é permitido"}}
+            elif orcamento_subrequisicao(request.scope, sub.metodo, caminho) > 0:
+                # Rotas caras (ex.: GET /alunos) mantêm o próprio limite dentro do batch
+                resposta = {"status": 429, "body": {"detail": "Muitas requisições, tente novamente em instantes"}}
+            else:
+                resposta = await executar_subrequisicao(app, request.scope, sub.metodo, sub.url)
+            respostas.append({"id": sub.id, "url": sub.url, **resposta})
+    finally:
+        usuario_compartilhado.reset(token_usuario)
+        sessao_compartilhada.reset(token_sessao)
+    
+    return {"respostas": respostas}
+
+# === ENDPOINTS DE JOBS ===
+
+@app.post("/jobs", response_model=JobResponse, status_code=202, tags=["Jobs"])
+def criar_job(
+    job: JobCreate,
+    usuario_atual: Usuario = Depends(usuario_ativo_required)
+):
+    """
+    Submete uma operação longa para execução em segundo plano
+    """
+    # Jobs administrativos (backup, arquivamento) seguem a mesma regra das rotas /admin
+    if exige_admin(job.tipo):
+        usuario_admin_required(usuario_atual)
+    try:
+        return submeter_job(job.tipo, job.parametros, usuario_atual.id, job.chave_idempotencia)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _job_visivel(job_id: int, usuario: Usuario):
+    """
+    Busca um job que o usuário pode ver: os que ele submeteu ou, para administradores,
+    todos da escola (jobs de outros usuários aparecem como inexistentes)
+    """
+    job = buscar_job(job_id)
+    if not job or (not usuario.admin and job.usuario_id != usuario.id):
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+@app.get("/jobs/{job_id}", response_model=JobResponse, tags=["Jobs"])
+def obter_job(
+    job_id: int,
+    usuario_atual: Usuario = Depends(usuario_ativo_required)
+):
+    """
+    Retorna o estado e o progresso de um job
+    """
+    return _job_visivel(job_id, usuario_atual)
+
+@app.get("/jobs/{job_id}/resultado", tags=["Jobs"])
+def obter_resultado_job(
+    job_id: int,
+    usuario_atual: Usuario = Depends(usuario_ativo_required)
+):
+    """
+    Retorna o resultado de um job concluído
+    """
+    job = _job_visivel(job_id, usuario_atual)
+    
+    if job.status != "concluido":
+        raise HTTPException(status_code=409, detail=f"Job ainda não concluído (status: {job.status})")
+    
+    return json.loads(job.resultado) if job.resultado else None
+
+# === ENDPOINTS ADMINISTRATIVOS ===
+
+def _resposta_perfil(conteudo: str, nome_arquivo: str) -> PlainTextResponse:
+    """
+    Devolve um perfil collapsed stack como arquivo para download
+    """
+    return PlainTextResponse(
+        conteudo,
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'}
+    )
+
+@app.get("/admin/profile", tags=["Administração"])
+def capturar_profile(
+    segundos: float = Query(10, gt=0, le=PROFILER_DURACAO_MAXIMA, description="Duração da captura"),
+    modo: str = Query("wall", pattern="^(wall|cpu)$", description="wall ou cpu"),
+    usuario_atual: Usuario = Depends(usuario_admin_required)
+):
+    """
+    Captura um perfil por amostragem do worker e retorna no formato collapsed stack
+    """
+    conteudo = capturar_perfil(segundos, modo)
+    if conteudo is None:
+        raise HTTPException(status_code=409, detail="Já existe uma captura de perfil em andamento")
+    
+    nome_arquivo = f"perfil-{modo}-{datetime.datetime.utcnow():%Y%m%d%H%M%S}.collapsed"
+    return _resposta_perfil(conteudo, nome_arquivo)
+
+@app.get("/admin/profile/requisicoes", tags=["Administração"])
+def listar_perfis_requisicoes(usuario_atual: Usuario = Depends(usuario_admin_required)):
+    """
+    Lista os perfis das requisições amostradas mais lentas
+    """
+    return perfis_lentos.listar()
+
+@app.get("/admin/profile/requisicoes/{perfil_id}", tags=["Administração"])
+def obter_perfil_requisicao(perfil_id: int, usuario_atual: Usuario = Depends(usuario_admin_required)):
+    """
+    Retorna o perfil de uma requisição amostrada no formato collapsed stack
+    """
+    perfil = perfis_lentos.obter(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    
+    return _resposta_perfil(formatar_colapsado(perfil["pilhas"]), f"requisicao-{perfil_id}.collapsed")
+
+@app.post("/admin/backup", response_model=JobResponse, status_code=202, tags=["Administração"])
+def criar_backup_online(
+    usuario_atual: Usuario = Depends(usuario_admin_required)
+):
+    """
+    Dispara um backup online do banco (executado pela fila de jobs)
+    """
+    return submeter_job("backup", {}, usuario_atual.id)
+
+@app.get("/admin/backups", tags=["Administração"])
+def listar_backups_disponiveis(usuario_atual: Usuario = Depends(usuario_admin_required)):
+    """
+    Lista os backups disponíveis (restauração via: python backup.py restaurar <arquivo>)
+    """
+    return listar_backups()
+
+@app.post("/admin/arquivo", response_model=JobResponse, status_code=202, tags=["Administração"])
+def arquivar_alunos_inativos(
+    anos: Optional[int] = Query(None, ge=1, description="Anos de inatividade (padrão ARQUIVO_ANOS_INATIVO)"),
+    usuario_atual: Usuario = Depends(usuario_admin_required)
+):
+    """
+    Dispara o arquivamento em lotes dos alunos inativos (executado pela fila de jobs)
+    """
+    parametros = {} if anos is None else {"anos": anos}
+    return submeter_job("arquivar_alunos", parametros, usuario_atual.id)
+
+@app.get("/admin/arquivo", tags=["Administração"])
+def obter_estatisticas_arquivo(usuario_atual: Usuario = Depends(usuario_admin_required)):
+    """
+    Tamanho da tabela de alunos, do arquivo e quantos alunos já podem ser arquivados
+    """
+    return estatisticas_arquivo()
+
 # Executar servidor se executado diretamente
 if __name__ == "__main__":
     import uvicorn
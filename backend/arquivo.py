@@ -0,0 +1,135 @@
+"""
+Arquivamento de alunos inativos
+Alunos inativos, sem turma e parados há mais de ARQUIVO_ANOS_INATIVO anos são movidos
+da tabela alunos para alunos_arquivo em lotes pequenos (uma transação curta por lote,
+com pausa entre eles), mantendo a tabela usada pelas listagens, buscas e contagens de
+ocupação do tamanho do ano letivo atual. As consultas podem incluir o arquivo
+explicitamente (GET /alunos?incluir_arquivo=true).
+
+O arquivamento roda como job (POST /admin/arquivo) e pode ser repetido com segurança:
+cada lote move e remove os mesmos alunos na mesma transação
+"""
+import datetime
+import os
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import delete, func, insert, literal, select
+
+from database import obter_sessionmaker
+from duplicados import remover_do_indice
+from jobs import atualizar_progresso, registrar_job
+from models import Aluno, AlunoArquivado
+from snapshot_alunos import snapshot_alunos
+
+# Configurações do arquivamento
+ARQUIVO_ANOS_INATIVO = int(os.getenv("ARQUIVO_ANOS_INATIVO", "1"))
+ARQUIVO_TAMANHO_LOTE = int(os.getenv("ARQUIVO_TAMANHO_LOTE", "500"))
+ARQUIVO_PAUSA_SEGUNDOS = float(os.getenv("ARQUIVO_PAUSA_SEGUNDOS", "0.05"))
+
+# Colunas copiadas de alunos para alunos_arquivo
+_COLUNAS = ("nome", "data_nascimento", "email", "status", "turma_id", "inativo_desde")
+
+
+def data_corte(anos: int, hoje: Optional[datetime.date] = None) -> datetime.date:
+    """
+    Alunos inativos desde esta data (inclusive) ou antes são arquivados
+    """
+    hoje = hoje or datetime.date.today()
+    try:
+        return hoje.replace(year=hoje.year - anos)
+    except ValueError:
+        # 29 de fevereiro em ano não bissexto
+        return hoje.replace(year=hoje.year - anos, day=28)
+
+
+def _elegiveis(corte: datetime.date):
+    return (
+        Aluno.status == "inativo",
+        Aluno.turma_id.is_(None),
+        Aluno.inativo_desde <= corte,
+    )
+
+
+def contar_elegiveis(anos: int = ARQUIVO_ANOS_INATIVO) -> int:
+    db = obter_sessionmaker()()
+    try:
+        return db.scalar(select(func.count(Aluno.id)).where(*_elegiveis(data_corte(anos)))) or 0
+    finally:
+        db.close()
+
+
+def arquivar_inativos(anos: int = ARQUIVO_ANOS_INATIVO, tamanho_lote: int = ARQUIVO_TAMANHO_LOTE,
+                      pausa: float = ARQUIVO_PAUSA_SEGUNDOS,
+                      progresso: Optional[Callable[[int], None]] = None) -> dict:
+    """
+    Move os alunos elegíveis para alunos_arquivo, um lote por transação
+    """
+    corte = data_corte(anos)
+    total = contar_elegiveis(anos)
+    arquivados = 0
+    lotes = 0
+    inicio = time.perf_counter()
+
+    while True:
+        db = obter_sessionmaker()()
+        try:
+            ids = db.scalars(
+                select(Aluno.id).where(*_elegiveis(corte)).order_by(Aluno.id).limit(tamanho_lote)
+            ).all()
+            if not ids:
+                break
+            db.execute(insert(AlunoArquivado).from_select(
+                ("aluno_id",) + _COLUNAS + ("arquivado_em",),
+                select(Aluno.id, *(getattr(Aluno, c) for c in _COLUNAS), literal(datetime.datetime.utcnow()))
+                .where(Aluno.id.in_(ids))
+            ))
+            db.execute(delete(Aluno).where(Aluno.id.in_(ids)))
+            remover_do_indice(db, ids)
+            db.commit()
+        finally:
+            db.close()
+
+        arquivados += len(ids)
+        lotes += 1
+        if progresso is not None and total:
+            progresso(min(99, arquivados * 100 // total))
+        # Libera o banco para as requisições entre um lote e outro
+        time.sleep(pausa)
+
+    return {
+        "arquivados": arquivados,
+        "lotes": lotes,
+        "inativos_desde_ate": corte.isoformat(),
+        "duracao_segundos": round(time.perf_counter() - inicio, 3),
+    }
+
+
+def estatisticas_arquivo() -> dict:
+    db = obter_sessionmaker()()
+    try:
+        return {
+            "alunos": db.scalar(select(func.count(Aluno.id))) or 0,
+            "alunos_arquivados": db.scalar(select(func.count(AlunoArquivado.id))) or 0,
+            "elegiveis": contar_elegiveis(),
+            "anos_inativo": ARQUIVO_ANOS_INATIVO,
+        }
+    finally:
+        db.close()
+
+
+def _recarregar_snapshot(resultado: dict):
+    # O job pode ter rodado em outro processo: o snapshot deste é recarregado do banco
+    if snapshot_alunos.ativo and resultado.get("arquivados"):
+        snapshot_alunos.carregar()
+
+
+@registrar_job("arquivar_alunos", ao_concluir=_recarregar_snapshot, admin=True)
+def job_arquivar_alunos(job_id: int, parametros: dict) -> dict:
+    """
+    Job de arquivamento disparado pelo endpoint administrativo
+    """
+    anos = int(parametros.get("anos", ARQUIVO_ANOS_INATIVO))
+    if anos < 1:
+        raise ValueError("anos deve ser maior ou igual a 1")
+    return arquivar_inativos(anos, progresso=lambda percentual: atualizar_progresso(job_id, percentual))
@@ -1,39 +1,76 @@
 """
 Módulo de autenticação para o Sistema de Gestão Escolar
 Implementa JWT tokens, hash de senhas e verificação de usuários
+python-jose e passlib/bcrypt são importados no primeiro uso, fora da inicialização do worker
 """
+from contextvars import ContextVar
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Union
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import uuid
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from models import Usuario
-from database import get_db
+from database import escola_atual, get_db
+from revogacao import revogacao_tokens
+import consultas
 
 # Configurações de segurança
 SECRET_KEY = "escola_secret_key_2024_muito_segura"  # Em produção, usar variável de ambiente
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 horas
 
-# Configuração do hash de senhas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Usernames que não podem ser registrados pelo /auth/register
+# O acesso às rotas administrativas (/admin) vem da coluna Usuario.admin, definida pelo criar_admin.py
+USERNAMES_RESERVADOS = {"admin", "administrador", "root"}
+
 
 # Esquema de autenticação Bearer Token
 security = HTTPBearer()
 
+# Usuário já autenticado pelo POST /batch, reutilizado pelas sub-requisições com o mesmo token
+usuario_compartilhado: ContextVar[Optional[tuple]] = ContextVar("usuario_compartilhado", default=None)
+
+@lru_cache(maxsize=None)
+def contexto_senhas():
+    """
+    Configuração do hash de senhas (criada no primeiro uso)
+    """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 def verificar_senha(senha_pura: str, senha_hash: str) -> bool:
     """
     Verifica se a senha fornecida confere com o hash armazenado
     """
-    return pwd_context.verify(senha_pura, senha_hash)
+    return contexto_senhas().verify(senha_pura, senha_hash)
 
 def criar_hash_senha(senha: str) -> str:
     """
     Cria um hash da senha para armazenamento seguro
     """
-    return pwd_context.hash(senha)
+    return contexto_senhas().hash(senha)
+
+def decodificar_token(token: str) -> Optional[dict]:
+    """
+    Valida a assinatura e a expiração de um JWT e retorna suas claims (None se inválido)
+    """
+    from jose import JWTError, jwt
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+def claims_nao_verificadas(token: str) -> Optional[dict]:
+    """
+    Lê as claims de um JWT sem validar a assinatura (apenas para roteamento)
+    """
+    from jose import JWTError, jwt
+    try:
+        return jwt.get_unverified_claims(token)
+    except JWTError:
+        return None
 
 def criar_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
@@ -45,15 +82,28 @@ def criar_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    # jti identifica o token para permitir a revogação no logout
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def revogar_access_token(token: str):
+    """
+    Revoga um JWT token até a sua expiração (logout)
+    """
+    payload = decodificar_token(token)
+    if payload is None:
+        return
+    jti = payload.get("jti")
+    if jti:
+        revogacao_tokens.revogar(jti, datetime.utcfromtimestamp(payload["exp"]))
+
 def autenticar_usuario(db: Session, username: str, senha: str) -> Optional[Usuario]:
     """
     Autentica um usuário verificando username e senha
     """
-    usuario = db.query(Usuario).filter(Usuario.username == username).first()
+    usuario = consultas.usuario_por_username(db, username)
     if not usuario:
         return None
     if not verificar_senha(senha, usuario.senha_hash):
@@ -67,23 +117,34 @@ async def obter_usuario_atual(
     """
     Obtém o usuário atual a partir do token JWT
     """
+    compartilhado = usuario_compartilhado.get()
+    if compartilhado is not None and compartilhado[0] == credentials.credentials:
+        return compartilhado[1]
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # Decodifica o token JWT
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    # Decodifica o token JWT
+    payload = decodificar_token(credentials.credentials)
+    if payload is None:
+        raise credentials_exception
+    username: str = payload.get("sub")
+    if username is None:
+        raise credentials_exception
+    # Token emitido para outra escola não vale nesta (modo multi-escola)
+    if payload.get("escola") != escola_atual.get():
+        raise credentials_exception
+    
+    # Verifica revogação em memória (filtro de Bloom, sem acesso ao banco)
+    jti = payload.get("jti")
+    if jti and revogacao_tokens.revogado(jti):
         raise credentials_exception
     
     # Busca o usuário no banco
-    usuario = db.query(Usuario).filter(Usuario.username == username).first()
+    usuario = consultas.usuario_por_username(db, username)
     if usuario is None:
         raise credentials_exception
     
@@ -105,3 +166,14 @@ def usuario_ativo_required(usuario: Usuario = Depends(obter_usuario_atual)) -> U
             detail="Usuário inativo"
         )
     return usuario
+
+def usuario_admin_required(usuario: Usuario = Depends(usuario_ativo_required)) -> Usuario:
+    """
+    Dependency que exige um usuário administrador
+    """
+    if not usuario.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito a administradores"
+        )
+    return usuario
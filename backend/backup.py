@@ -0,0 +1,206 @@
+"""
+Backup online do banco SQLite sem bloquear o tráfego
+Usa a API de backup incremental do SQLite copiando poucas páginas por passo e
+pausando entre os passos, para que as requisições continuem sendo atendidas.
+O arquivo é gravado em um temporário, verificado com integrity_check e só então
+renomeado; os backups mais antigos além da retenção configurada são removidos.
+
+Uso pela linha de comando:
+    python backup.py criar
+    python backup.py listar
+    python backup.py restaurar backups/app-20240101-120000.db   (com o servidor parado)
+"""
+import datetime
+import os
+import sqlite3
+import sys
+import time
+from typing import Callable, List, Optional
+
+from database import escola_atual, obter_engine
+from jobs import registrar_job
+
+# Configurações de backup
+BACKUP_DIRETORIO = os.getenv("BACKUP_DIRETORIO", "./backups")
+BACKUP_RETENCAO = int(os.getenv("BACKUP_RETENCAO", "7"))             # Quantidade de backups mantidos
+BACKUP_PAGINAS_POR_PASSO = int(os.getenv("BACKUP_PAGINAS_POR_PASSO", "64"))
+BACKUP_PAUSA_SEGUNDOS = float(os.getenv("BACKUP_PAUSA_SEGUNDOS", "0.005"))
+
+# Escritas de outras conexões reiniciam o backup incremental; após este número de
+# reinícios a cópia é feita em um único passo para garantir que termine
+BACKUP_MAX_REINICIOS = 5
+
+
+class BackupReiniciado(Exception):
+    """Backup incremental reiniciado vezes demais por escritas concorrentes"""
+
+
+def caminho_banco() -> str:
+    """
+    Caminho do arquivo SQLite usado pela aplicação (o da escola atual no modo multi-escola)
+    """
+    return os.path.abspath(obter_engine().url.database)
+
+
+def diretorio_backups() -> str:
+    """
+    Diretório de backups; no modo multi-escola cada escola tem o seu subdiretório
+    """
+    escola = escola_atual.get()
+    return BACKUP_DIRETORIO if escola is None else os.path.join(BACKUP_DIRETORIO, escola)
+
+
+def verificar_integridade(caminho: str) -> bool:
+    """
+    Executa PRAGMA integrity_check em um arquivo de banco
+    """
+    conexao = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        return conexao.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    finally:
+        conexao.close()
+
+
+def copiar_online(origem: str, destino: str, paginas_por_passo: int = BACKUP_PAGINAS_POR_PASSO,
+                  pausa: float = BACKUP_PAUSA_SEGUNDOS,
+                  progresso: Optional[Callable[[int], None]] = None):
+    """
+    Copia o banco de origem para o destino em passos pequenos, pausando entre eles
+    """
+    conexao_origem = sqlite3.connect(origem, check_same_thread=False)
+    conexao_destino = sqlite3.connect(destino)
+    reinicios = 0
+    restante_anterior = None
+
+    def ao_avancar(status, restante, total):
+        nonlocal reinicios, restante_anterior
+        if restante_anterior is not None and restante > restante_anterior:
+            reinicios += 1
+            if reinicios > BACKUP_MAX_REINICIOS:
+                raise BackupReiniciado()
+        restante_anterior = restante
+        if progresso is not None and total:
+            progresso((total - restante) * 100 // total)
+        # Pausa fora de qualquer lock do SQLite, liberando o banco para as requisições
+        time.sleep(pausa)
+
+    try:
+        try:
+            conexao_origem.backup(conexao_destino, pages=paginas_por_passo, progress=ao_avancar)
+        except BackupReiniciado:
+            conexao_origem.backup(conexao_destino, pages=-1)
+    finally:
+        conexao_destino.close()
+        conexao_origem.close()
+
+
+def listar_backups(diretorio: Optional[str] = None) -> List[dict]:
+    """
+    Lista os backups existentes, do mais recente para o mais antigo
+    """
+    diretorio = diretorio or diretorio_backups()
+    if not os.path.isdir(diretorio):
+        return []
+    backups = []
+    for nome in sorted(os.listdir(diretorio), reverse=True):
+        if nome.endswith(".db"):
+            caminho = os.path.join(diretorio, nome)
+            backups.append({
+                "arquivo": nome,
+                "tamanho_bytes": os.path.getsize(caminho),
+                "criado_em": datetime.datetime.utcfromtimestamp(os.path.getmtime(caminho)).isoformat(),
+            })
+    return backups
+
+
+def aplicar_retencao(diretorio: Optional[str] = None, retencao: int = BACKUP_RETENCAO) -> List[str]:
+    """
+    Remove os backups mais antigos além da retenção configurada
+    """
+    diretorio = diretorio or diretorio_backups()
+    removidos = []
+    for backup in listar_backups(diretorio)[retencao:]:
+        os.remove(os.path.join(diretorio, backup["arquivo"]))
+        removidos.append(backup["arquivo"])
+    return removidos
+
+
+def criar_backup(diretorio: Optional[str] = None, origem: Optional[str] = None,
+                 progresso: Optional[Callable[[int], None]] = None) -> dict:
+    """
+    Cria um backup verificado do banco e aplica a retenção
+    """
+    diretorio = diretorio or diretorio_backups()
+    origem = origem or caminho_banco()
+    os.makedirs(diretorio, exist_ok=True)
+    prefixo = os.path.splitext(os.path.basename(origem))[0]
+    nome = f"{prefixo}-{datetime.datetime.utcnow():%Y%m%d-%H%M%S-%f}.db"
+    destino = os.path.join(diretorio, nome)
+    temporario = destino + ".tmp"
+
+    inicio = time.perf_counter()
+    try:
+        copiar_online(origem, temporario, progresso=progresso)
+        if not verificar_integridade(temporario):
+            raise RuntimeError("Backup gerado falhou no integrity_check")
+        os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    return {
+        "arquivo": nome,
+        "tamanho_bytes": os.path.getsize(destino),
+        "duracao_segundos": round(time.perf_counter() - inicio, 3),
+        "removidos": aplicar_retencao(diretorio),
+    }
+
+
+def restaurar_backup(arquivo: str, destino: Optional[str] = None):
+    """
+    Restaura um backup sobre o banco da aplicação após verificar sua integridade
+    Deve ser executado com o servidor parado
+    """
+    destino = destino or caminho_banco()
+    if not os.path.exists(arquivo):
+        arquivo = os.path.join(diretorio_backups(), arquivo)
+    if not verificar_integridade(arquivo):
+        raise RuntimeError(f"Backup {arquivo} falhou no integrity_check, restauração cancelada")
+
+    conexao_backup = sqlite3.connect(f"file:{arquivo}?mode=ro", uri=True)
+    conexao_destino = sqlite3.connect(destino)
+    try:
+        conexao_backup.backup(conexao_destino)
+    finally:
+        conexao_destino.close()
+        conexao_backup.close()
+
+    if not verificar_integridade(destino):
+        raise RuntimeError("Banco restaurado falhou no integrity_check")
+
+
+@registrar_job("backup", admin=True)
+def job_backup(job_id: int, parametros: dict) -> dict:
+    """
+    Job de backup online disparado pelo endpoint administrativo
+    O progresso só é gravado no fim: qualquer escrita no banco durante a cópia
+    reiniciaria o backup incremental
+    """
+    return criar_backup()
+
+
+if __name__ == "__main__":
+    comando = sys.argv[1] if len(sys.argv) > 1 else ""
+    if comando == "criar":
+        resultado = criar_backup(progresso=lambda percentual: print(f"{percentual}%", end="\r"))
+        print(f"Backup criado: {resultado['arquivo']} ({resultado['tamanho_bytes']} bytes "
+              f"em {resultado['duracao_segundos']}s)")
+    elif comando == "listar":
+        for item in listar_backups():
+            print(f"{item['arquivo']}  {item['tamanho_bytes']} bytes  {item['criado_em']}")
+    elif comando == "restaurar" and len(sys.argv) > 2:
+        restaurar_backup(sys.argv[2])
+        print("Backup restaurado com sucesso!")
+    else:
+        print("Uso: python backup.py criar | listar | restaurar <arquivo>")
+        sys.exit(1)
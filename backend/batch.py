@@ -0,0 +1,83 @@
+"""
+Execução de várias requisições de leitura em uma única chamada (POST /batch)
+As sub-requisições são despachadas em processo para as rotas existentes, sem passar
+novamente pelos middlewares, compartilhando a autenticação e a sessão de banco do batch
+"""
+import json
+from contextlib import AsyncExitStack
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from starlette.requests import Request
+
+# Limite de sub-requisições por batch
+BATCH_MAX_REQUISICOES = 20
+
+
+def _manipulador_excecao(app, exc: Exception):
+    """
+    Procura o exception handler registrado na aplicação para a exceção (pela MRO)
+    """
+    for classe in type(exc).__mro__:
+        if classe in app.exception_handlers:
+            return app.exception_handlers[classe]
+    return None
+
+
+async def executar_subrequisicao(app, scope_batch: dict, metodo: str, url: str) -> dict:
+    """
+    Executa uma sub-requisição contra o roteador da aplicação e devolve status e corpo
+    """
+    partes = urlsplit(url)
+    cabecalhos: List[Tuple[bytes, bytes]] = [
+        (nome, valor) for nome, valor in scope_batch.get("headers", [])
+        if nome.lower() in (b"authorization", b"host", b"user-agent")
+    ]
+    scope = {
+        "type": "http",
+        "asgi": scope_batch.get("asgi", {"version": "3.0"}),
+        "http_version": scope_batch.get("http_version", "1.1"),
+        "method": metodo,
+        "scheme": scope_batch.get("scheme", "http"),
+        "server": scope_batch.get("server"),
+        "client": scope_batch.get("client"),
+        "root_path": scope_batch.get("root_path", ""),
+        "path": partes.path,
+        "raw_path": partes.path.encode("utf-8"),
+        "query_string": partes.query.encode("utf-8"),
+        "headers": cabecalhos,
+        "app": app,
+    }
+
+    async def receber():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    status_code: Optional[int] = None
+    corpo = bytearray()
+
+    async def enviar(mensagem):
+        nonlocal status_code
+        if mensagem["type"] == "http.response.start":
+            status_code = mensagem["status"]
+        elif mensagem["type"] == "http.response.body":
+            corpo.extend(mensagem.get("body", b""))
+
+    # Sem os middlewares, as exceções (HTTPException, validação) são convertidas aqui
+    # pelos mesmos handlers da aplicação, e a pilha de saída das dependências com
+    # yield é criada aqui como o middleware do FastAPI faria
+    try:
+        async with AsyncExitStack() as pilha:
+            scope["fastapi_astack"] = pilha
+            await app.router(scope, receber, enviar)
+    except Exception as exc:
+        manipulador = _manipulador_excecao(app, exc)
+        if manipulador is None:
+            raise
+        resposta = await manipulador(Request(scope, receber), exc)
+        await resposta(scope, receber, enviar)
+
+    try:
+        conteudo = json.loads(corpo) if corpo else None
+    except ValueError:
+        conteudo = corpo.decode("utf-8", errors="replace")
+    return {"status": status_code, "body": conteudo}
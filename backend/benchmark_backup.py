@@ -0,0 +1,109 @@
+"""
+Benchmark do impacto do backup na latência (p50/p99) das operações do banco
+Cria um banco temporário com muitos alunos e mede a latência de uma carga mista
+(consultas por id e, a cada PROPORCAO_ESCRITAS operações, uma escrita com commit)
+em três cenários:
+- sem backup
+- durante o backup online incremental (backup.copiar_online)
+- durante uma cópia em passo único (bloqueante), para comparação
+
+Uso: python benchmark_backup.py [quantidade_de_alunos]
+"""
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from backup import copiar_online
+
+DURACAO_CENARIO_SEGUNDOS = 5.0
+PROPORCAO_ESCRITAS = 20
+
+
+def criar_banco(caminho: str, quantidade: int):
+    conexao = sqlite3.connect(caminho)
+    conexao.executescript("""
+        CREATE TABLE turmas (id INTEGER PRIMARY KEY, nome VARCHAR(100) NOT NULL UNIQUE, capacidade INTEGER NOT NULL);
+        CREATE TABLE alunos (
+            id INTEGER PRIMARY KEY, nome VARCHAR(80) NOT NULL, data_nascimento DATE NOT NULL,
+            email VARCHAR(255) UNIQUE, status VARCHAR(20) NOT NULL, turma_id INTEGER REFERENCES turmas(id)
+        );
+    """)
+    conexao.executemany("INSERT INTO turmas (id, nome, capacidade) VALUES (?, ?, 50)",
+                        [(i, f"Turma {i}") for i in range(1, 201)])
+    conexao.executemany(
+        "INSERT INTO alunos (nome, data_nascimento, email, status, turma_id) VALUES (?, ?, ?, ?, ?)",
+        [(f"Aluno {i} da Silva", f"20{10 + i % 8}-0{1 + i % 9}-1{i % 9}", f"aluno{i}@escola.com",
+          "ativo" if i % 4 else "inativo", 1 + i % 200) for i in range(quantidade)]
+    )
+    conexao.commit()
+    conexao.close()
+
+
+def carga(caminho: str, parar: threading.Event, latencias: list):
+    """
+    Executa operações semelhantes às das rotas (busca por id e matrícula) medindo cada uma
+    """
+    conexao = sqlite3.connect(caminho, timeout=30)
+    operacoes = 0
+    while not parar.is_set():
+        operacoes += 1
+        inicio = time.perf_counter()
+        if operacoes % PROPORCAO_ESCRITAS == 0:
+            conexao.execute("UPDATE alunos SET status = 'ativo' WHERE id = ?", (random.randint(1, 1000),))
+            conexao.commit()
+        else:
+            conexao.execute("SELECT * FROM alunos WHERE id = ?", (random.randint(1, 1000),)).fetchall()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        time.sleep(0.002)
+    conexao.close()
+
+
+def executar_cenario(caminho: str, nome: str, operacao=None):
+    parar = threading.Event()
+    latencias = []
+    trabalhador = threading.Thread(target=carga, args=(caminho, parar, latencias))
+    trabalhador.start()
+
+    inicio = time.perf_counter()
+    backups = 0
+    while time.perf_counter() - inicio < DURACAO_CENARIO_SEGUNDOS:
+        if operacao is None:
+            time.sleep(0.1)
+            continue
+        destino = caminho + ".bak"
+        operacao(caminho, destino)
+        os.remove(destino)
+        backups += 1
+
+    parar.set()
+    trabalhador.join()
+    latencias.sort()
+    p99 = latencias[int(len(latencias) * 0.99) - 1]
+    print(f"{nome:<28} ops={len(latencias):>6}  p50={statistics.median(latencias):7.2f} ms  "
+          f"p99={p99:7.2f} ms  max={latencias[-1]:8.2f} ms  backups={backups}")
+
+
+def copia_passo_unico(origem: str, destino: str):
+    conexao_origem = sqlite3.connect(origem)
+    conexao_destino = sqlite3.connect(destino)
+    conexao_origem.backup(conexao_destino, pages=-1)
+    conexao_destino.close()
+    conexao_origem.close()
+
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as diretorio:
+        caminho = os.path.join(diretorio, "benchmark.db")
+        print(f"Criando banco com {quantidade} alunos...")
+        criar_banco(caminho, quantidade)
+        print(f"Tamanho do banco: {os.path.getsize(caminho) / 1024 / 1024:.1f} MB\n")
+
+        executar_cenario(caminho, "sem backup")
+        executar_cenario(caminho, "backup online incremental", copiar_online)
+        executar_cenario(caminho, "backup em passo único", copia_passo_unico)
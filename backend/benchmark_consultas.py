@@ -0,0 +1,117 @@
+"""
+Micro-benchmark do custo por chamada das consultas mais acessadas
+Compara a forma antiga (db.query(...).filter(...) montada a cada chamada) com as
+consultas pré-montadas de consultas.py, lambda_stmt e Session.get.
+Cada chamada usa uma sessão nova, como acontece em uma requisição.
+
+Uso: python benchmark_consultas.py [iteracoes]
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import consultas
+from database import Base
+from models import Aluno, Turma, Usuario
+
+
+def preparar_banco(caminho: str):
+    engine_bench = create_engine(f"sqlite:///{caminho}")
+    Base.metadata.create_all(bind=engine_bench)
+    Sessao = sessionmaker(bind=engine_bench)
+    db = Sessao()
+    db.add_all([Turma(id=i, nome=f"Turma {i}", capacidade=40) for i in range(1, 21)])
+    db.add_all([
+        Aluno(nome=f"Aluno {i}", data_nascimento=datetime.date(2010, 1 + i % 12, 1 + i % 28),
+              email=f"aluno{i}@escola.com", status="ativo" if i % 3 else "inativo", turma_id=1 + i % 20)
+        for i in range(2000)
+    ])
+    db.add(Usuario(username="admin", email="admin@escola.com", senha_hash="x",
+                   nome_completo="Administrador", ativo=True))
+    db.commit()
+    db.close()
+    return engine_bench, Sessao
+
+
+def medir(Sessao, iteracoes: int, operacao, repeticoes: int = 3) -> float:
+    """
+    Tempo médio por chamada em microssegundos (abrindo uma sessão por chamada)
+    Retorna a melhor de algumas repetições para reduzir o ruído
+    """
+    for _ in range(50):
+        db = Sessao()
+        operacao(db)
+        db.close()
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(iteracoes):
+            db = Sessao()
+            operacao(db)
+            db.close()
+        melhor = min(melhor, (time.perf_counter() - inicio) / iteracoes * 1e6)
+    return melhor
+
+
+def comparar(Sessao, iteracoes: int, nome: str, antes, depois):
+    t_antes = medir(Sessao, iteracoes, antes)
+    t_depois = medir(Sessao, iteracoes, depois)
+    print(f"{nome:<32} antes={t_antes:8.1f} µs  depois={t_depois:8.1f} µs  "
+          f"({(1 - t_depois / t_antes) * 100:5.1f}% menos)")
+
+
+if __name__ == "__main__":
+    iteracoes = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    with tempfile.TemporaryDirectory() as diretorio:
+        engine_bench, Sessao = preparar_banco(os.path.join(diretorio, "benchmark.db"))
+        print(f"{iteracoes} chamadas por consulta\n")
+
+        comparar(
+            Sessao, iteracoes, "usuário por username",
+            lambda db: db.query(Usuario).filter(Usuario.username == "admin").first(),
+            lambda db: consultas.usuario_por_username(db, "admin"),
+        )
+        comparar(
+            Sessao, iteracoes, "aluno por id (Session.get)",
+            lambda db: db.query(Aluno).filter(Aluno.id == 42).first(),
+            lambda db: db.get(Aluno, 42),
+        )
+        comparar(
+            Sessao, iteracoes, "turma por id (Session.get)",
+            lambda db: db.query(Turma).filter(Turma.id == 7).first(),
+            lambda db: db.get(Turma, 7),
+        )
+        comparar(
+            Sessao, iteracoes, "ocupação da turma",
+            lambda db: db.query(Aluno).filter(Aluno.turma_id == 7, Aluno.status == "ativo").count(),
+            lambda db: consultas.ocupacao_turma(db, 7),
+        )
+        comparar(
+            Sessao, max(1, iteracoes // 10), "ocupação de todas as turmas",
+            lambda db: [db.query(Aluno).filter(Aluno.turma_id == t.id, Aluno.status == "ativo").count()
+                        for t in db.query(Turma).all()],
+            lambda db: consultas.ocupacao_por_turma(db),
+        )
+        comparar(
+            Sessao, max(1, iteracoes // 10), "alunos por turma e status",
+            lambda db: db.query(Aluno).filter(Aluno.turma_id == 7, Aluno.status == "ativo").all(),
+            lambda db: consultas.listar_alunos(db, turma_id=7, status="ativo"),
+        )
+
+        # Com a mesma sessão (ex.: sub-requisições de um POST /batch) o Session.get
+        # encontra o objeto no mapa de identidade e não consulta o banco
+        db = Sessao()
+        aluno = db.get(Aluno, 42)  # Mantém a referência: o mapa de identidade guarda referências fracas
+        inicio = time.perf_counter()
+        for _ in range(iteracoes):
+            db.get(Aluno, 42)
+        print(f"\nSession.get com o objeto já no mapa de identidade: "
+              f"{(time.perf_counter() - inicio) / iteracoes * 1e6:.1f} µs")
+        del aluno
+        db.close()
+        engine_bench.dispose()
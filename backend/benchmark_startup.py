@@ -0,0 +1,87 @@
+"""
+Benchmark do tempo de inicialização de um worker (time-to-first-request)
+Sobe o uvicorn em um subprocesso com um diretório de trabalho temporário e mede o
+tempo até a primeira resposta de GET / e de GET /turmas, em dois cenários:
+- banco novo (migrações aplicadas na inicialização)
+- banco existente na versão atual (apenas a verificação rápida da versão)
+
+Uso: python benchmark_startup.py [repeticoes] [diretorio_do_backend]
+O diretório do backend permite comparar com outra versão do código (ex.: um git worktree)
+"""
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TEMPO_LIMITE_SEGUNDOS = 30
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def aguardar_resposta(porta: int, caminho: str, limite: float):
+    while time.perf_counter() < limite:
+        try:
+            conexao = http.client.HTTPConnection("127.0.0.1", porta, timeout=1)
+            conexao.request("GET", caminho)
+            resposta = conexao.getresponse()
+            resposta.read()
+            conexao.close()
+            return resposta.status
+        except OSError:
+            time.sleep(0.005)
+    raise TimeoutError(f"Servidor não respondeu a {caminho} em {TEMPO_LIMITE_SEGUNDOS}s")
+
+
+def medir_inicializacao(diretorio_backend: str, diretorio_trabalho: str):
+    """
+    Retorna (segundos até GET /, segundos até GET /turmas) para um worker novo
+    """
+    porta = porta_livre()
+    ambiente = dict(os.environ, PYTHONPATH=diretorio_backend)
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(porta), "--log-level", "warning"],
+        cwd=diretorio_trabalho, env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        limite = inicio + TEMPO_LIMITE_SEGUNDOS
+        aguardar_resposta(porta, "/", limite)
+        primeira = time.perf_counter() - inicio
+        aguardar_resposta(porta, "/turmas", limite)
+        return primeira, time.perf_counter() - inicio
+    finally:
+        processo.terminate()
+        processo.wait()
+
+
+def executar_cenario(nome: str, diretorio_backend: str, repeticoes: int, banco_novo: bool):
+    tempos_raiz, tempos_turmas = [], []
+    with tempfile.TemporaryDirectory() as diretorio_trabalho:
+        if not banco_novo:
+            # Primeira execução cria o banco; as medidas começam com ele já atualizado
+            medir_inicializacao(diretorio_backend, diretorio_trabalho)
+        for _ in range(repeticoes):
+            if banco_novo and os.path.exists(os.path.join(diretorio_trabalho, "app.db")):
+                os.remove(os.path.join(diretorio_trabalho, "app.db"))
+            raiz, turmas = medir_inicializacao(diretorio_backend, diretorio_trabalho)
+            tempos_raiz.append(raiz * 1000)
+            tempos_turmas.append(turmas * 1000)
+    print(f"{nome:<18} GET / = {statistics.median(tempos_raiz):7.1f} ms (mín. {min(tempos_raiz):7.1f})   "
+          f"GET /turmas = {statistics.median(tempos_turmas):7.1f} ms (mín. {min(tempos_turmas):7.1f})   "
+          f"mediana de {repeticoes}")
+
+
+if __name__ == "__main__":
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    diretorio_backend = os.path.abspath(sys.argv[2]) if len(sys.argv) > 2 else os.path.dirname(os.path.abspath(__file__))
+    print(f"Backend: {diretorio_backend}\n")
+    executar_cenario("banco novo", diretorio_backend, repeticoes, banco_novo=True)
+    executar_cenario("banco existente", diretorio_backend, repeticoes, banco_novo=False)
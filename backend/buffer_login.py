@@ -0,0 +1,144 @@
+"""
+Buffer de escrita atrasada (write-behind) para o campo Usuario.ultimo_login
+Acumula os horários de login em memória e grava tudo em um único UPDATE em lote,
+evitando uma transação de escrita no SQLite a cada login
+"""
+import datetime
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+
+from database import escola_atual, obter_sessionmaker
+from models import Usuario
+
+# Configurações do buffer
+LOGIN_FLUSH_INTERVALO_SEGUNDOS = float(os.getenv("LOGIN_FLUSH_INTERVALO_SEGUNDOS", "5"))
+LOGIN_FLUSH_MAX_PENDENTES = int(os.getenv("LOGIN_FLUSH_MAX_PENDENTES", "100"))
+
+
+class BufferUltimoLogin:
+    """
+    Guarda o último login de cada usuário até o próximo flush
+    Vários logins do mesmo usuário no intervalo viram uma única escrita
+    As entradas são indexadas por (escola, usuario_id) e gravadas no banco de cada escola
+    """
+
+    def __init__(self, intervalo: float = LOGIN_FLUSH_INTERVALO_SEGUNDOS,
+                 max_pendentes: int = LOGIN_FLUSH_MAX_PENDENTES):
+        self.intervalo = intervalo
+        self.max_pendentes = max_pendentes
+        self._pendentes: Dict[Tuple[Optional[str], int], datetime.datetime] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def registrar(self, usuario_id: int, momento: datetime.datetime):
+        """
+        Registra um login; dispara o flush antecipado se o buffer encher
+        """
+        with self._lock:
+            self._pendentes[(escola_atual.get(), usuario_id)] = momento
+            cheio = len(self._pendentes) >= self.max_pendentes
+        if cheio:
+            self._acordar.set()
+
+    def pendente(self, usuario_id: int) -> Optional[datetime.datetime]:
+        """
+        Retorna o login ainda não gravado do usuário (se houver)
+        """
+        with self._lock:
+            return self._pendentes.get((escola_atual.get(), usuario_id))
+
+    def flush(self) -> int:
+        """
+        Grava todos os logins pendentes, uma transação por escola
+        Retorna a quantidade de usuários atualizados; se alguma escola falhar, as demais
+        são gravadas, as entradas dela voltam ao buffer e o erro é lançado no fim
+        """
+        with self._flush_lock:
+            with self._lock:
+                lote, self._pendentes = self._pendentes, {}
+            if not lote:
+                return 0
+
+            stmt = (
+                update(Usuario.__table__)
+                .where(Usuario.__table__.c.id == bindparam("b_id"))
+                .values(ultimo_login=bindparam("b_login"))
+            )
+            por_escola = defaultdict(list)
+            for (escola, uid), momento in lote.items():
+                por_escola[escola].append({"b_id": uid, "b_login": momento})
+
+            gravados = 0
+            falhas = []
+            # Uma escola com erro não impede a gravação das demais
+            for escola, parametros in por_escola.items():
+                token = escola_atual.set(escola)
+                db = None
+                try:
+                    db = obter_sessionmaker()()
+                    db.execute(stmt, parametros)
+                    db.commit()
+                    gravados += len(parametros)
+                except Exception as e:
+                    if db is not None:
+                        db.rollback()
+                    # Devolve ao buffer o que não foi gravado, sem sobrescrever logins mais novos
+                    with self._lock:
+                        for item in parametros:
+                            self._pendentes.setdefault((escola, item["b_id"]), item["b_login"])
+                    falhas.append((escola, e))
+                finally:
+                    if db is not None:
+                        db.close()
+                    escola_atual.reset(token)
+
+            if falhas:
+                escolas = ", ".join(str(escola) for escola, _ in falhas)
+                raise RuntimeError(
+                    f"Falha ao gravar ultimo_login ({escolas}); pendentes mantidos no buffer"
+                ) from falhas[0][1]
+            return gravados
+
+    def _executar(self):
+        """
+        Laço da thread de flush periódico
+        """
+        while not self._parar.is_set():
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao gravar ultimo_login em lote: {e}")
+
+    def iniciar(self):
+        """
+        Inicia a thread de flush periódico
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="flush-ultimo-login", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """
+        Para a thread e grava o que ainda estiver pendente
+        """
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.intervalo + 5)
+            self._thread = None
+        self.flush()
+
+
+# Instância única usada pela aplicação
+buffer_ultimo_login = BufferUltimoLogin()
@@ -0,0 +1,185 @@
+"""
+Compressão das respostas da API com negociação gzip/brotli
+Respostas acima de um tamanho mínimo são comprimidas conforme o Accept-Encoding do cliente.
+Cada corpo recebe um ETag; as versões já comprimidas ficam em cache (LRU) pelo ETag,
+então uma resposta repetida não paga a CPU da compressão de novo
+"""
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional, sem ele apenas gzip é oferecido
+    brotli = None
+
+# Tamanho mínimo do corpo (bytes) para valer a pena comprimir
+COMPRESSAO_TAMANHO_MINIMO = int(os.getenv("COMPRESSAO_TAMANHO_MINIMO", "1024"))
+
+# Níveis de compressão (equilíbrio entre CPU e tamanho)
+NIVEL_GZIP = 6
+NIVEL_BROTLI = 5
+
+# Limite de memória do cache de corpos comprimidos
+CACHE_COMPRESSAO_MAX_BYTES = int(os.getenv("CACHE_COMPRESSAO_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Tipos de conteúdo que compensam comprimir
+TIPOS_COMPRESSIVEIS = (b"application/json", b"text/")
+
+
+def calcular_etag(corpo: bytes) -> str:
+    """
+    ETag fraco derivado do conteúdo (não comprimido) do corpo
+    """
+    return 'W/"' + hashlib.blake2b(corpo, digest_size=16).hexdigest() + '"'
+
+
+def escolher_codificacao(accept_encoding: str) -> Optional[str]:
+    """
+    Escolhe a melhor codificação aceita pelo cliente (br > gzip)
+    """
+    aceitas: Dict[str, float] = {}
+    for parte in accept_encoding.split(","):
+        item = parte.strip().split(";")
+        nome = item[0].strip().lower()
+        q = 1.0
+        for parametro in item[1:]:
+            parametro = parametro.strip()
+            if parametro.startswith("q="):
+                try:
+                    q = float(parametro[2:])
+                except ValueError:
+                    q = 0.0
+        if nome:
+            aceitas[nome] = q
+
+    candidatas = (["br"] if brotli is not None else []) + ["gzip"]
+    for codificacao in candidatas:
+        if aceitas.get(codificacao, aceitas.get("*", 0.0)) > 0:
+            return codificacao
+    return None
+
+
+def comprimir(corpo: bytes, codificacao: str) -> bytes:
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=NIVEL_BROTLI)
+    return gzip.compress(corpo, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+class CacheCompressao:
+    """
+    Cache LRU de corpos já comprimidos, indexado por (ETag, codificação)
+    """
+
+    def __init__(self, max_bytes: int = CACHE_COMPRESSAO_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes_usados = 0
+        self._itens: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    def obter(self, etag: str, codificacao: str, corpo: bytes) -> bytes:
+        chave = (etag, codificacao)
+        comprimido = self._itens.get(chave)
+        if comprimido is not None:
+            self._itens.move_to_end(chave)
+            return comprimido
+
+        comprimido = comprimir(corpo, codificacao)
+        if len(comprimido) <= self.max_bytes:
+            self._itens[chave] = comprimido
+            self.bytes_usados += len(comprimido)
+            while self.bytes_usados > self.max_bytes:
+                _, removido = self._itens.popitem(last=False)
+                self.bytes_usados -= len(removido)
+        return comprimido
+
+
+class CompressaoMiddleware:
+    """
+    Middleware ASGI de compressão e ETag
+    Respostas em streaming (vários pedaços de corpo) passam sem alteração
+    """
+
+    def __init__(self, app, tamanho_minimo: int = COMPRESSAO_TAMANHO_MINIMO):
+        self.app = app
+        self.tamanho_minimo = tamanho_minimo
+        self.cache = CacheCompressao()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        cabecalhos_req = {nome.lower(): valor for nome, valor in scope.get("headers", [])}
+        codificacao = escolher_codificacao(cabecalhos_req.get(b"accept-encoding", b"").decode("latin-1"))
+        if_none_match = cabecalhos_req.get(b"if-none-match", b"").decode("latin-1")
+        metodo = scope["method"]
+
+        inicio: Optional[dict] = None
+        em_streaming = False
+
+        async def enviar(mensagem):
+            nonlocal inicio, em_streaming
+            if em_streaming:
+                await send(mensagem)
+                return
+
+            if mensagem["type"] == "http.response.start":
+                inicio = mensagem
+                return
+
+            if mensagem["type"] != "http.response.body":
+                await send(mensagem)
+                return
+
+            if mensagem.get("more_body", False):
+                # Streaming: envia como veio, sem comprimir
+                em_streaming = True
+                await send(inicio)
+                await send(mensagem)
+                return
+
+            await self._enviar_completo(send, inicio, mensagem.get("body", b""),
+                                        metodo, codificacao, if_none_match)
+
+        await self.app(scope, receive, enviar)
+
+    async def _enviar_completo(self, send, inicio: dict, corpo: bytes, metodo: str,
+                               codificacao: Optional[str], if_none_match: str):
+        cabecalhos: List[Tuple[bytes, bytes]] = list(inicio.get("headers", []))
+        nomes = {nome.lower(): valor for nome, valor in cabecalhos}
+        status_code = inicio["status"]
+
+        if status_code != 200 or b"content-encoding" in nomes:
+            await send(inicio)
+            await send({"type": "http.response.body", "body": corpo})
+            return
+
+        etag = None
+        if metodo == "GET" and b"etag" not in nomes:
+            etag = calcular_etag(corpo)
+            if etag in [valor.strip() for valor in if_none_match.split(",")]:
+                await send({
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [(b"etag", etag.encode()), (b"vary", b"Accept-Encoding")],
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+            cabecalhos.append((b"etag", etag.encode()))
+
+        tipo = nomes.get(b"content-type", b"")
+        if (codificacao is not None and len(corpo) >= self.tamanho_minimo
+                and tipo.startswith(TIPOS_COMPRESSIVEIS)):
+            if etag is not None:
+                corpo = self.cache.obter(etag, codificacao, corpo)
+            else:
+                corpo = comprimir(corpo, codificacao)
+            cabecalhos = [(n, v) for n, v in cabecalhos if n.lower() != b"content-length"]
+            cabecalhos.append((b"content-length", str(len(corpo)).encode()))
+            cabecalhos.append((b"content-encoding", codificacao.encode()))
+            cabecalhos.append((b"vary", b"Accept-Encoding"))
+
+        await send({"type": "http.response.start", "status": status_code, "headers": cabecalhos})
+        await send({"type": "http.response.body", "body": corpo})
@@ -0,0 +1,70 @@
+"""
+Configuração dos testes automatizados (python -m pytest, na pasta backend)
+Os testes usam um banco SQLite temporário: as variáveis de ambiente são definidas
+antes de qualquer módulo da aplicação ser importado
+"""
+import os
+import shutil
+import tempfile
+
+_diretorio_testes = tempfile.mkdtemp(prefix="escola-testes-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_diretorio_testes, 'app.db')}"
+os.environ["ESCOLAS_DIRETORIO"] = os.path.join(_diretorio_testes, "escolas")
+os.environ["BACKUP_DIRETORIO"] = os.path.join(_diretorio_testes, "backups")
+os.environ["MULTI_ESCOLA"] = "0"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from auth import criar_access_token
+from database import SessionLocal, engine
+from migracoes import aplicar_migracoes
+from models import Usuario
+
+# test_api.py é um script manual contra um servidor em execução (python test_api.py)
+collect_ignore = ["test_api.py"]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def banco():
+    """
+    Banco temporário com o esquema atual, removido no fim da sessão
+    """
+    aplicar_migracoes(engine)
+    yield engine
+    engine.dispose()
+    shutil.rmtree(_diretorio_testes, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def usuarios(banco):
+    """
+    Cabeçalhos de autorização de um usuário comum (professor) e de um administrador (diretora)
+    """
+    db = SessionLocal()
+    try:
+        for username, admin in (("professor", False), ("diretora", True)):
+            db.add(Usuario(
+                username=username,
+                email=f"{username}@escola.com",
+                senha_hash="-",
+                nome_completo=username.capitalize(),
+                admin=admin
+            ))
+        db.commit()
+    finally:
+        db.close()
+    return {
+        username: {"Authorization": f"Bearer {criar_access_token({'sub': username})}"}
+        for username in ("professor", "diretora")
+    }
+
+
+@pytest.fixture(scope="session")
+def cliente(banco):
+    """
+    Cliente HTTP da aplicação sem os eventos de inicialização
+    (a fila de jobs não é iniciada: os testes controlam a execução)
+    """
+    from app import app
+    return TestClient(app)
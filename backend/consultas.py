@@ -0,0 +1,108 @@
+"""
+Consultas das rotas mais acessadas, montadas uma única vez
+Os select() abaixo são construídos na importação do módulo e recebem os valores
+por bindparam, evitando reconstruir a consulta ORM e recalcular sua chave de cache
+a cada requisição. Buscas por chave primária usam Session.get (mapa de identidade).
+As listagens de alunos (e do arquivo), que combinam filtros opcionais, usam lambda_stmt.
+A busca por nome é literal (% e _ não são curingas) e ignora maiúsculas também fora do
+ASCII, igual ao SnapshotAlunos.filtrar
+"""
+from typing import Dict, Optional
+
+from sqlalchemy import bindparam, func, lambda_stmt, select
+from sqlalchemy.orm import Session
+
+from database import minusculas
+from models import Aluno, AlunoArquivado, Turma, Usuario
+
+# === CONSULTAS PRÉ-MONTADAS ===
+
+USUARIO_POR_USERNAME = select(Usuario).where(Usuario.username == bindparam("username")).limit(1)
+USUARIO_POR_EMAIL = select(Usuario).where(Usuario.email == bindparam("email")).limit(1)
+ALUNO_POR_EMAIL = select(Aluno).where(Aluno.email == bindparam("email")).limit(1)
+TURMA_POR_NOME = select(Turma).where(Turma.nome == bindparam("nome")).limit(1)
+
+# Ocupação = alunos ativos na turma
+OCUPACAO_TURMA = select(func.count(Aluno.id)).where(
+    Aluno.turma_id == bindparam("turma_id"),
+    Aluno.status == "ativo"
+)
+OCUPACAO_POR_TURMA = (
+    select(Aluno.turma_id, func.count(Aluno.id))
+    .where(Aluno.status == "ativo")
+    .group_by(Aluno.turma_id)
+)
+TURMAS = select(Turma).order_by(Turma.id)
+
+
+def padrao_busca_nome(search: str) -> str:
+    """
+    Padrão LIKE (escape "/") de "contém o termo", comparado com minusculas(nome)
+    """
+    termo = minusculas(search).replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{termo}%"
+
+
+def usuario_por_username(db: Session, username: str) -> Optional[Usuario]:
+    return db.scalars(USUARIO_POR_USERNAME, {"username": username}).first()
+
+
+def usuario_por_email(db: Session, email: str) -> Optional[Usuario]:
+    return db.scalars(USUARIO_POR_EMAIL, {"email": email}).first()
+
+
+def aluno_por_email(db: Session, email: str) -> Optional[Aluno]:
+    return db.scalars(ALUNO_POR_EMAIL, {"email": email}).first()
+
+
+def turma_por_nome(db: Session, nome: str) -> Optional[Turma]:
+    return db.scalars(TURMA_POR_NOME, {"nome": nome}).first()
+
+
+def ocupacao_turma(db: Session, turma_id: int) -> int:
+    return db.scalar(OCUPACAO_TURMA, {"turma_id": turma_id}) or 0
+
+
+def ocupacao_por_turma(db: Session) -> Dict[int, int]:
+    """
+    Ocupação de todas as turmas em uma única consulta
+    """
+    return dict(db.execute(OCUPACAO_POR_TURMA).all())
+
+
+def listar_turmas(db: Session):
+    return db.scalars(TURMAS).all()
+
+
+def listar_alunos(db: Session, search: Optional[str] = None, turma_id: Optional[int] = None,
+                  status: Optional[str] = None):
+    """
+    Lista alunos com filtros opcionais
+    Cada combinação de filtros gera uma consulta compilada uma vez e reaproveitada;
+    os valores capturados pelas lambdas viram parâmetros
+    """
+    stmt = lambda_stmt(lambda: select(Aluno))
+    if search:
+        padrao = padrao_busca_nome(search)
+        stmt += lambda s: s.where(func.minusculas(Aluno.nome).like(padrao, escape="/"))
+    if turma_id:
+        stmt += lambda s: s.where(Aluno.turma_id == turma_id)
+    if status:
+        stmt += lambda s: s.where(Aluno.status == status)
+    return db.scalars(stmt).all()
+
+
+def listar_arquivados(db: Session, search: Optional[str] = None, turma_id: Optional[int] = None,
+                      status: Optional[str] = None):
+    """
+    Mesmos filtros de listar_alunos aplicados à tabela de alunos arquivados
+    """
+    stmt = lambda_stmt(lambda: select(AlunoArquivado))
+    if search:
+        padrao = padrao_busca_nome(search)
+        stmt += lambda s: s.where(func.minusculas(AlunoArquivado.nome).like(padrao, escape="/"))
+    if turma_id:
+        stmt += lambda s: s.where(AlunoArquivado.turma_id == turma_id)
+    if status:
+        stmt += lambda s: s.where(AlunoArquivado.status == status)
+    return db.scalars(stmt).all()
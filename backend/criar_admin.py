@@ -1,26 +1,36 @@
 """
 Script para criar usuário administrativo inicial
 Execute este script após configurar o banco de dados
+No modo multi-escola, informe a escola: python criar_admin.py <escola>
+(é o único caminho para criar o banco de uma escola nova)
+Para dar acesso administrativo a um usuário admin já existente: python criar_admin.py [escola] --promover
 """
-from database import SessionLocal, engine
-from models import Base, Usuario
+from database import cache_engines, escola_atual, obter_engine, obter_sessionmaker
+from migracoes import aplicar_migracoes
+from models import Usuario
 from auth import criar_hash_senha
 import datetime
+import sys
 
-# Cria as tabelas se não existirem
-Base.metadata.create_all(bind=engine)
-
-def criar_usuario_admin():
+def criar_usuario_admin(promover: bool = False):
     """
     Cria um usuário administrador inicial
     """
-    db = SessionLocal()
+    db = obter_sessionmaker()()
     
     try:
         # Verifica se já existe um usuário admin
         admin_existente = db.query(Usuario).filter(Usuario.username == "admin").first()
         if admin_existente:
-            print("Usuário admin já existe!")
+            if admin_existente.admin:
+                print("Usuário admin já existe!")
+            elif promover:
+                admin_existente.admin = True
+                db.commit()
+                print("Usuário admin promovido a administrador!")
+            else:
+                print("Usuário admin já existe, mas não é administrador.")
+                print("Confira o cadastro e promova com: python criar_admin.py [escola] --promover")
             return
         
         # Cria o usuário admin
@@ -32,6 +42,7 @@ def criar_usuario_admin():
             senha_hash=senha_hash,
             nome_completo="Administrador do Sistema",
             ativo=True,
+            admin=True,
             data_criacao=datetime.datetime.utcnow()
         )
         
@@ -50,4 +61,10 @@ def criar_usuario_admin():
         db.close()
 
 if __name__ == "__main__":
-    criar_usuario_admin()
+    argumentos = [a for a in sys.argv[1:] if a != "--promover"]
+    if argumentos:
+        escola_atual.set(argumentos[0])
+        cache_engines.obter(argumentos[0], criar=True)
+    # Cria ou atualiza as tabelas do banco (da escola, se informada)
+    aplicar_migracoes(obter_engine())
+    criar_usuario_admin(promover="--promover" in sys.argv[1:])
@@ -1,12 +1,21 @@
 """
 Configuração do banco de dados SQLite usando SQLAlchemy
 """
-from sqlalchemy import create_engine
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 # URL do banco SQLite - arquivo app.db será criado na pasta backend
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+# DATABASE_URL permite usar outro arquivo (ex.: o banco temporário dos testes)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
 # Configuração do engine SQLite
 # check_same_thread=False permite uso em múltiplas threads (necessário para FastAPI)
@@ -15,6 +24,20 @@ engine = create_engine(
     connect_args={"check_same_thread": False}
 )
 
+
+def minusculas(texto: Optional[str]) -> Optional[str]:
+    """
+    Minúsculas com a regra do Python (Unicode) para as buscas por nome
+    """
+    return texto.lower() if texto is not None else None
+
+
+@event.listens_for(Engine, "connect")
+def _registrar_funcoes(conexao_dbapi, _):
+    # lower()/LIKE do SQLite só convertem ASCII ("JOÃO" não encontraria "João"):
+    # as consultas usam minusculas(), a mesma função do snapshot em memória
+    conexao_dbapi.create_function("minusculas", 1, minusculas, deterministic=True)
+
 # Configuração da sessão do banco
 # autocommit=False: transações manuais
 # autoflush=False: controle manual do flush
@@ -23,12 +46,153 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base para os modelos SQLAlchemy
 Base = declarative_base()
 
+# Sessão compartilhada entre as sub-requisições de um POST /batch
+# Quando definida, get_db reutiliza essa sessão em vez de abrir uma nova
+sessao_compartilhada: ContextVar[Optional[Session]] = ContextVar("sessao_compartilhada", default=None)
+
+# === MODO MULTI-ESCOLA ===
+# Cada escola tem seu próprio arquivo SQLite (escolas/<id>.db). O app.db principal
+# continua guardando os dados globais (fila de jobs e tokens revogados).
+# Bancos de escola só são criados pelo criar_admin.py; as requisições usam apenas os existentes
+
+MULTI_ESCOLA = os.getenv("MULTI_ESCOLA", "0") == "1"
+ESCOLAS_DIRETORIO = os.getenv("ESCOLAS_DIRETORIO", "./escolas")
+ESCOLAS_MAX_ENGINES = int(os.getenv("ESCOLAS_MAX_ENGINES", "50"))              # Engines abertos ao mesmo tempo
+ESCOLAS_OCIOSIDADE_SEGUNDOS = float(os.getenv("ESCOLAS_OCIOSIDADE_SEGUNDOS", "600"))  # Fecha engines ociosos
+ESCOLAS_AQUECER = [e for e in os.getenv("ESCOLAS_AQUECER", "").split(",") if e]  # Abertos na inicialização
+
+# Identificador de escola aceito (também usado como nome de arquivo)
+PADRAO_ID_ESCOLA = re.compile(r"^[a-z0-9][a-z0-9_-]{0,49}$")
+
+# Escola da requisição atual (definida pelo EscolaMiddleware ou por scripts)
+escola_atual: ContextVar[Optional[str]] = ContextVar("escola_atual", default=None)
+
+
+class CacheEngines:
+    """
+    Cache LRU de engines/sessionmakers por escola, com descarte dos ociosos
+    """
+
+    def __init__(self, max_engines: int = ESCOLAS_MAX_ENGINES, ociosidade: float = ESCOLAS_OCIOSIDADE_SEGUNDOS):
+        self.max_engines = max_engines
+        self.ociosidade = ociosidade
+        self._itens: "OrderedDict[str, list]" = OrderedDict()  # escola -> [engine, sessionmaker, ultimo_uso]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def caminho(escola: str) -> str:
+        if not PADRAO_ID_ESCOLA.match(escola):
+            raise ValueError(f"Identificador de escola inválido: {escola}")
+        return os.path.join(ESCOLAS_DIRETORIO, f"{escola}.db")
+
+    def existe(self, escola: str) -> bool:
+        """
+        Se a escola já tem banco (aberto no cache ou em disco)
+        """
+        return escola in self._itens or os.path.exists(self.caminho(escola))
+
+    def _criar(self, escola: str, criar: bool) -> list:
+        caminho = self.caminho(escola)
+        if criar:
+            os.makedirs(ESCOLAS_DIRETORIO, exist_ok=True)
+        elif not os.path.exists(caminho):
+            # Sem isso o SQLite criaria o arquivo de uma escola inexistente
+            raise LookupError(f"Escola não encontrada: {escola}")
+        from migracoes import aplicar_migracoes
+        novo = create_engine(f"sqlite:///{caminho}", connect_args={"check_same_thread": False})
+        # Banco novo de escola recebe o esquema completo; um existente, as migrações pendentes
+        aplicar_migracoes(novo)
+        return [novo, sessionmaker(autocommit=False, autoflush=False, bind=novo), time.monotonic()]
+
+    def obter(self, escola: str, criar: bool = False) -> list:
+        """
+        Engine, sessionmaker e último uso da escola; criar=True cria o banco se ainda não existir
+        """
+        agora = time.monotonic()
+        descartados = []
+        with self._lock:
+            item = self._itens.get(escola)
+            if item is not None:
+                item[2] = agora
+                self._itens.move_to_end(escola)
+            # Descarta os ociosos (do mais antigo para o mais novo) e o excesso do LRU
+            while self._itens:
+                mais_antigo, (engine_antigo, _, ultimo_uso) = next(iter(self._itens.items()))
+                if mais_antigo == escola:
+                    break
+                if len(self._itens) < self.max_engines and agora - ultimo_uso < self.ociosidade:
+                    break
+                del self._itens[mais_antigo]
+                descartados.append(engine_antigo)
+        for engine_antigo in descartados:
+            engine_antigo.dispose()
+        if item is not None:
+            return item
+
+        novo = self._criar(escola, criar)
+        with self._lock:
+            existente = self._itens.get(escola)
+            if existente is not None:
+                # Outra thread criou o mesmo engine enquanto este era preparado
+                novo[0].dispose()
+                return existente
+            self._itens[escola] = novo
+        return novo
+
+    def aquecer(self, escolas):
+        """
+        Abre os engines das escolas informadas e já estabelece uma conexão em cada um
+        """
+        for escola in escolas:
+            if not self.existe(escola):
+                print(f"Escola {escola} de ESCOLAS_AQUECER não tem banco; ignorada")
+                continue
+            engine_escola, _, _ = self.obter(escola)
+            with engine_escola.connect() as conexao:
+                conexao.execute(text("SELECT 1"))
+
+    def fechar_todos(self):
+        with self._lock:
+            itens, self._itens = list(self._itens.values()), OrderedDict()
+        for engine_escola, _, _ in itens:
+            engine_escola.dispose()
+
+
+cache_engines = CacheEngines()
+
+
+def obter_engine() -> Engine:
+    """
+    Engine do banco da escola atual (ou o principal fora do modo multi-escola)
+    """
+    escola = escola_atual.get()
+    if escola is None:
+        return engine
+    return cache_engines.obter(escola)[0]
+
+
+def obter_sessionmaker() -> sessionmaker:
+    """
+    Fábrica de sessões do banco da escola atual (ou a principal fora do modo multi-escola)
+    """
+    escola = escola_atual.get()
+    if escola is None:
+        return SessionLocal
+    return cache_engines.obter(escola)[1]
+
+
 def get_db():
     """
     Dependency para obter sessão do banco de dados
     Usado pelo FastAPI para injeção de dependência
     """
-    db = SessionLocal()
+    compartilhada = sessao_compartilhada.get()
+    if compartilhada is not None:
+        # Sessão de um batch: quem a abriu é responsável por fechá-la
+        yield compartilhada
+        return
+    
+    db = obter_sessionmaker()()
     try:
         yield db
     finally:
@@ -0,0 +1,240 @@
+"""
+Detecção de alunos possivelmente duplicados
+O índice de blocagem alunos_trigramas guarda, para cada aluno, os trigramas do nome
+normalizado (sem acentos, minúsculo) junto com a data de nascimento. A busca por
+duplicados de um nome só lê as linhas com a mesma data de nascimento e trigramas em
+comum, sem percorrer a tabela de alunos; a similaridade final é o índice de Jaccard
+entre os conjuntos de trigramas.
+
+O índice é mantido por eventos do mapper de Aluno, na mesma transação da escrita
+(inclusive em scripts como seed.py). Remoções em massa via Core, como o arquivamento,
+precisam chamar remover_do_indice.
+
+O relatório completo (job relatorio_duplicados) agrupa os alunos por data de nascimento
+e compara os blocos em paralelo em um pool de processos
+"""
+import datetime
+import math
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, func, insert, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import obter_sessionmaker
+from jobs import atualizar_progresso, registrar_job
+from models import Aluno, AlunoTrigrama
+
+# Configurações da detecção
+DUPLICADOS_SIMILARIDADE_MINIMA = float(os.getenv("DUPLICADOS_SIMILARIDADE_MINIMA", "0.5"))
+DUPLICADOS_PROCESSOS = int(os.getenv("DUPLICADOS_PROCESSOS", str(os.cpu_count() or 1)))
+DUPLICADOS_MAX_PARES_RELATORIO = int(os.getenv("DUPLICADOS_MAX_PARES_RELATORIO", "1000"))
+DUPLICADOS_MAX_SUGESTOES = 5                  # Possíveis duplicados devolvidos na criação
+DUPLICADOS_BLOCOS_POR_TAREFA = 500            # Datas de nascimento enviadas a cada processo por vez
+
+_NAO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+
+# === NORMALIZAÇÃO E TRIGRAMAS ===
+
+def normalizar_nome(nome: str) -> str:
+    """
+    Remove acentos e pontuação e deixa em minúsculas ("João  d'Ávila" -> "joao d avila")
+    """
+    sem_acentos = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode("ascii")
+    return _NAO_ALFANUMERICO.sub(" ", sem_acentos.lower()).strip()
+
+
+def trigramas(nome: str) -> FrozenSet[str]:
+    """
+    Trigramas de cada palavra do nome normalizado, com espaços nas bordas (como o pg_trgm)
+    """
+    resultado = set()
+    for palavra in normalizar_nome(nome).split():
+        texto = f"  {palavra} "
+        resultado.update(texto[i:i + 3] for i in range(len(texto) - 2))
+    return frozenset(resultado)
+
+
+def similaridade(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    comuns = len(a & b)
+    return comuns / (len(a) + len(b) - comuns)
+
+
+# === MANUTENÇÃO DO ÍNDICE ===
+
+def _linhas_indice(aluno_id: int, nome: str, data_nascimento: datetime.date) -> List[dict]:
+    return [
+        {"aluno_id": aluno_id, "data_nascimento": data_nascimento, "trigrama": trigrama}
+        for trigrama in trigramas(nome)
+    ]
+
+
+def indexar(conexao: Connection, alunos: Iterable[Tuple[int, str, datetime.date]]):
+    """
+    Insere no índice as linhas de (id, nome, data_nascimento) informados
+    """
+    linhas = [linha for aluno in alunos for linha in _linhas_indice(*aluno)]
+    if linhas:
+        conexao.execute(insert(AlunoTrigrama), linhas)
+
+
+def remover_do_indice(conexao, aluno_ids: List[int]):
+    if aluno_ids:
+        conexao.execute(delete(AlunoTrigrama).where(AlunoTrigrama.aluno_id.in_(aluno_ids)))
+
+
+@event.listens_for(Aluno, "after_insert")
+def _apos_inserir(mapper, conexao, aluno):
+    indexar(conexao, [(aluno.id, aluno.nome, aluno.data_nascimento)])
+
+
+@event.listens_for(Aluno, "after_update")
+def _apos_atualizar(mapper, conexao, aluno):
+    estado = inspect(aluno)
+    if estado.attrs.nome.history.has_changes() or estado.attrs.data_nascimento.history.has_changes():
+        remover_do_indice(conexao, [aluno.id])
+        indexar(conexao, [(aluno.id, aluno.nome, aluno.data_nascimento)])
+
+
+@event.listens_for(Aluno, "after_delete")
+def _apos_excluir(mapper, conexao, aluno):
+    remover_do_indice(conexao, [aluno.id])
+
+
+# === BUSCA NA CRIAÇÃO ===
+
+def buscar_possiveis_duplicados(db: Session, nome: str, data_nascimento: datetime.date,
+                                ignorar_id: Optional[int] = None,
+                                minimo: float = DUPLICADOS_SIMILARIDADE_MINIMA) -> List[dict]:
+    """
+    Alunos com a mesma data de nascimento e nome parecido, do mais para o menos similar
+    Lê apenas as linhas do índice do bloco (data de nascimento) com trigramas em comum
+    """
+    alvo = trigramas(nome)
+    if not alvo:
+        return []
+    # Jaccard >= minimo exige ao menos minimo * |alvo| trigramas em comum
+    comuns_minimos = max(1, math.ceil(minimo * len(alvo)))
+    candidatos = db.execute(
+        select(AlunoTrigrama.aluno_id)
+        .where(AlunoTrigrama.data_nascimento == data_nascimento, AlunoTrigrama.trigrama.in_(alvo))
+        .group_by(AlunoTrigrama.aluno_id)
+        .having(func.count() >= comuns_minimos)
+    ).scalars().all()
+    candidatos = [c for c in candidatos if c != ignorar_id]
+    if not candidatos:
+        return []
+
+    encontrados = []
+    for aluno_id, nome_candidato, data in db.execute(
+        select(Aluno.id, Aluno.nome, Aluno.data_nascimento).where(Aluno.id.in_(candidatos))
+    ):
+        valor = similaridade(alvo, trigramas(nome_candidato))
+        if valor >= minimo:
+            encontrados.append({
+                "id": aluno_id,
+                "nome": nome_candidato,
+                "data_nascimento": data,
+                "similaridade": round(valor, 3),
+            })
+    encontrados.sort(key=lambda item: -item["similaridade"])
+    return encontrados[:DUPLICADOS_MAX_SUGESTOES]
+
+
+# === RELATÓRIO COMPLETO ===
+
+def comparar_blocos(blocos: List[Tuple[str, List[Tuple[int, str]]]], minimo: float) -> List[dict]:
+    """
+    Compara os alunos de cada bloco (mesma data de nascimento) dois a dois
+    Executado nos processos do pool: recebe apenas dados, sem acesso ao banco
+    """
+    pares = []
+    for data, alunos in blocos:
+        conjuntos = [(aluno_id, nome, trigramas(nome)) for aluno_id, nome in alunos]
+        for i, (id_a, nome_a, tri_a) in enumerate(conjuntos):
+            for id_b, nome_b, tri_b in conjuntos[i + 1:]:
+                valor = similaridade(tri_a, tri_b)
+                if valor >= minimo:
+                    pares.append({
+                        "aluno_a": {"id": id_a, "nome": nome_a},
+                        "aluno_b": {"id": id_b, "nome": nome_b},
+                        "data_nascimento": data,
+                        "similaridade": round(valor, 3),
+                    })
+    return pares
+
+
+def _carregar_blocos() -> List[Tuple[str, List[Tuple[int, str]]]]:
+    """
+    Alunos agrupados por data de nascimento, apenas as datas com mais de um aluno
+    """
+    db = obter_sessionmaker()()
+    try:
+        repetidas = (
+            select(Aluno.data_nascimento)
+            .group_by(Aluno.data_nascimento)
+            .having(func.count() > 1)
+            .subquery()
+        )
+        blocos: Dict[str, List[Tuple[int, str]]] = defaultdict(list)
+        consulta = (
+            select(Aluno.id, Aluno.nome, Aluno.data_nascimento)
+            .where(Aluno.data_nascimento.in_(select(repetidas.c.data_nascimento)))
+            .order_by(Aluno.data_nascimento, Aluno.id)
+        )
+        for aluno_id, nome, data in db.execute(consulta).yield_per(5000):
+            blocos[data.isoformat()].append((aluno_id, nome))
+        return list(blocos.items())
+    finally:
+        db.close()
+
+
+def gerar_relatorio(minimo: float = DUPLICADOS_SIMILARIDADE_MINIMA, processos: int = DUPLICADOS_PROCESSOS,
+                    progresso=None) -> dict:
+    """
+    Lista os pares de possíveis duplicados da tabela inteira
+    """
+    blocos = _carregar_blocos()
+    tarefas = [blocos[i:i + DUPLICADOS_BLOCOS_POR_TAREFA]
+               for i in range(0, len(blocos), DUPLICADOS_BLOCOS_POR_TAREFA)]
+    pares: List[dict] = []
+
+    if processos <= 1 or len(tarefas) <= 1:
+        for concluidas, tarefa in enumerate(tarefas, 1):
+            pares.extend(comparar_blocos(tarefa, minimo))
+            if progresso is not None:
+                progresso(concluidas * 100 // len(tarefas))
+    else:
+        with ProcessPoolExecutor(max_workers=min(processos, len(tarefas))) as executor:
+            futuros = [executor.submit(comparar_blocos, tarefa, minimo) for tarefa in tarefas]
+            for concluidas, futuro in enumerate(as_completed(futuros), 1):
+                pares.extend(futuro.result())
+                if progresso is not None:
+                    progresso(concluidas * 100 // len(tarefas))
+
+    pares.sort(key=lambda par: (-par["similaridade"], par["aluno_a"]["id"]))
+    return {
+        "total_pares": len(pares),
+        "blocos_comparados": len(blocos),
+        "similaridade_minima": minimo,
+        "pares": pares[:DUPLICADOS_MAX_PARES_RELATORIO],
+    }
+
+
+@registrar_job("relatorio_duplicados")
+def job_relatorio_duplicados(job_id: int, parametros: dict) -> dict:
+    """
+    Job do relatório de possíveis alunos duplicados (POST /jobs com tipo relatorio_duplicados)
+    """
+    minimo = float(parametros.get("similaridade_minima", DUPLICADOS_SIMILARIDADE_MINIMA))
+    if not 0 < minimo <= 1:
+        raise ValueError("similaridade_minima deve estar entre 0 e 1")
+    return gerar_relatorio(minimo, progresso=lambda percentual: atualizar_progresso(job_id, min(99, percentual)))
@@ -0,0 +1,80 @@
+"""
+Middleware do modo multi-escola
+Identifica a escola de cada requisição (cabeçalho X-Escola ou claim "escola" do token)
+e a define em database.escola_atual, fazendo get_db abrir sessões no banco dessa escola.
+A validação do token continua em auth.obter_usuario_atual, que rejeita tokens de outra escola.
+Só escolas com banco já criado (python criar_admin.py <escola>) são aceitas: uma escola
+desconhecida recebe 404 e nenhum arquivo é criado
+"""
+import json
+from typing import Optional
+
+from auth import claims_nao_verificadas
+from database import MULTI_ESCOLA, PADRAO_ID_ESCOLA, cache_engines, escola_atual
+
+# Rotas que não dependem de escola (documentação e raiz)
+ROTAS_SEM_ESCOLA = {"/", "/docs", "/openapi.json", "/redoc", "/docs/oauth2-redirect"}
+
+
+class EscolaMiddleware:
+    """
+    Middleware ASGI que define a escola atual da requisição
+    Sem efeito quando MULTI_ESCOLA está desligado
+    """
+
+    def __init__(self, app, ativo: bool = MULTI_ESCOLA):
+        self.app = app
+        self.ativo = ativo
+
+    async def __call__(self, scope, receive, send):
+        if not self.ativo or scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        escola = self._escola_requisicao(scope)
+        if escola is None:
+            if scope["path"] in ROTAS_SEM_ESCOLA:
+                await self.app(scope, receive, send)
+                return
+            await self._rejeitar(send, "Escola não informada (cabeçalho X-Escola)")
+            return
+        if not PADRAO_ID_ESCOLA.match(escola):
+            await self._rejeitar(send, "Identificador de escola inválido")
+            return
+        if not cache_engines.existe(escola):
+            await self._rejeitar(send, "Escola não encontrada", 404)
+            return
+
+        token = escola_atual.set(escola)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            escola_atual.reset(token)
+
+    @staticmethod
+    def _escola_requisicao(scope) -> Optional[str]:
+        cabecalhos = {nome.lower(): valor for nome, valor in scope.get("headers", [])}
+        escola = cabecalhos.get(b"x-escola")
+        if escola:
+            return escola.decode("latin-1").strip().lower()
+
+        # Sem cabeçalho, usa a escola gravada no token (assinatura verificada depois, em auth)
+        autorizacao = cabecalhos.get(b"authorization")
+        if autorizacao and autorizacao.lower().startswith(b"bearer "):
+            claims = claims_nao_verificadas(autorizacao[7:].decode("latin-1")) or {}
+            escola = claims.get("escola")
+            return escola if isinstance(escola, str) else None
+        return None
+
+    @staticmethod
+    async def _rejeitar(send, mensagem: str, codigo: int = 400):
+        corpo = json.dumps({"detail": mensagem}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": codigo,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": corpo})
@@ -0,0 +1,280 @@
+"""
+Chaves de idempotência (cabeçalho Idempotency-Key) para os POSTs de criação
+A primeira resposta de cada chave é gravada na tabela respostas_idempotentes e
+devolvida às novas tentativas sem executar a rota de novo. A chave vale apenas para
+quem a enviou (usuário do token, ou o cliente anônimo): a mesma chave de outro cliente
+não recebe a resposta gravada. Requisições simultâneas
+com a mesma chave no mesmo processo esperam a primeira terminar; entre processos
+a reserva da chave no banco garante uma única execução (as demais recebem 409)
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from auth import decodificar_token
+from database import escola_atual, obter_sessionmaker
+from limitador import LimitadorRequisicoes
+from models import RespostaIdempotente
+
+# Rotas POST que aceitam Idempotency-Key
+ROTAS_IDEMPOTENTES = {"/alunos", "/turmas", "/matriculas"}
+
+# Configurações das chaves
+IDEMPOTENCIA_VALIDADE_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_VALIDADE_SEGUNDOS", "86400"))  # Respostas guardadas por 24h
+IDEMPOTENCIA_RESERVA_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_RESERVA_SEGUNDOS", "60"))  # Reserva de uma execução em andamento
+IDEMPOTENCIA_LIMPEZA_SEGUNDOS = 600           # Intervalo entre remoções das chaves expiradas
+TAMANHO_MAXIMO_CHAVE = 255
+
+# Respostas que dependem do momento (autenticação, limite, conflito) não são repetidas
+STATUS_NAO_GRAVADOS = {401, 403, 408, 409, 429}
+
+# (hash da requisição, status, content-type, corpo)
+Resposta = Tuple[str, int, Optional[str], bytes]
+
+
+def _sha256(*partes: bytes) -> str:
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(parte)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class IdempotenciaMiddleware:
+    """
+    Middleware ASGI que aplica o Idempotency-Key nas rotas de ROTAS_IDEMPOTENTES
+    Registrado dentro do EscolaMiddleware: as chaves ficam no banco da escola atual
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Execuções em andamento neste processo: (escola, chave) -> futuro com a resposta
+        self._em_andamento: Dict[Tuple[Optional[str], str], asyncio.Future] = {}
+        self._ultima_limpeza: Dict[Optional[str], float] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in ROTAS_IDEMPOTENTES:
+            await self.app(scope, receive, send)
+            return
+
+        cabecalhos = {nome.lower(): valor for nome, valor in scope.get("headers", [])}
+        chave_cliente = cabecalhos.get(b"idempotency-key")
+        if chave_cliente is None:
+            await self.app(scope, receive, send)
+            return
+        if not chave_cliente or len(chave_cliente) > TAMANHO_MAXIMO_CHAVE:
+            await self._responder_erro(send, 400, "Idempotency-Key inválida")
+            return
+
+        corpo_requisicao, receive = await self._ler_corpo(receive)
+        hash_requisicao = _sha256(corpo_requisicao)
+        chave = _sha256(scope["path"].encode(), self._sujeito(scope, cabecalhos), chave_cliente)
+        chave_memoria = (escola_atual.get(), chave)
+
+        while True:
+            # Mesma chave já executando neste processo: espera e reaproveita a resposta
+            futuro = self._em_andamento.get(chave_memoria)
+            if futuro is not None:
+                resposta = await asyncio.shield(futuro)
+                if resposta is None:
+                    continue  # A execução anterior não gerou resposta reaproveitável
+                await self._repetir(send, resposta, hash_requisicao)
+                return
+
+            futuro = asyncio.get_running_loop().create_future()
+            self._em_andamento[chave_memoria] = futuro
+            try:
+                existente = await run_in_threadpool(self._reservar, chave, hash_requisicao)
+                if existente is not None:
+                    futuro.set_result(existente if existente[1] is not None else None)
+                    if existente[1] is None:
+                        # Reservada por outro processo que ainda está executando
+                        await self._responder_erro(send, 409, "Requisição com esta Idempotency-Key em andamento",
+                                                   {b"retry-after": b"1"})
+                    else:
+                        await self._repetir(send, existente, hash_requisicao)
+                    return
+
+                resposta = await self._executar(scope, receive, send, chave, hash_requisicao)
+                futuro.set_result(resposta)
+                return
+            except BaseException:
+                if not futuro.done():
+                    await run_in_threadpool(self._liberar, chave)
+                    futuro.set_result(None)
+                raise
+            finally:
+                self._em_andamento.pop(chave_memoria, None)
+
+    async def _executar(self, scope, receive, send, chave: str, hash_requisicao: str) -> Optional[Resposta]:
+        """
+        Executa a rota capturando a resposta e a grava para as próximas tentativas
+        """
+        capturada = {"status": 500, "content_type": None, "corpo": []}
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                capturada["status"] = mensagem["status"]
+                for nome, valor in mensagem.get("headers", []):
+                    if nome.lower() == b"content-type":
+                        capturada["content_type"] = valor.decode("latin-1")
+            elif mensagem["type"] == "http.response.body":
+                capturada["corpo"].append(mensagem.get("body", b""))
+            await send(mensagem)
+
+        await self.app(scope, receive, enviar)
+
+        status = capturada["status"]
+        if status >= 500 or status in STATUS_NAO_GRAVADOS:
+            await run_in_threadpool(self._liberar, chave)
+            return None
+        resposta = (hash_requisicao, status, capturada["content_type"], b"".join(capturada["corpo"]))
+        await run_in_threadpool(self._gravar, chave, resposta)
+        return resposta
+
+    @staticmethod
+    def _sujeito(scope, cabecalhos) -> bytes:
+        """
+        Quem fez a requisição: o "sub" de um token válido, senão o cabeçalho Authorization
+        recebido e, sem ele, o IP do cliente
+        """
+        autorizacao = cabecalhos.get(b"authorization")
+        if autorizacao and autorizacao.lower().startswith(b"bearer "):
+            payload = decodificar_token(autorizacao[7:].decode("latin-1")) or {}
+            if payload.get("sub"):
+                return b"usuario:" + str(payload["sub"]).encode("utf-8")
+        if autorizacao:
+            return b"autorizacao:" + autorizacao
+        return b"ip:" + LimitadorRequisicoes._ip_cliente(scope).encode("latin-1")
+
+    # === ACESSO AO BANCO (executado no threadpool) ===
+
+    def _reservar(self, chave: str, hash_requisicao: str) -> Optional[Resposta]:
+        """
+        Reserva a chave para esta execução
+        Retorna None se reservada, ou a resposta já gravada (status None = em andamento)
+        """
+        agora = datetime.datetime.utcnow()
+        db = obter_sessionmaker()()
+        try:
+            self._limpar_expirados(db, agora)
+            registro = db.get(RespostaIdempotente, chave)
+            if registro is not None and registro.expira_em <= agora:
+                db.delete(registro)
+                db.flush()
+                registro = None
+            if registro is None:
+                db.add(RespostaIdempotente(
+                    chave=chave,
+                    hash_requisicao=hash_requisicao,
+                    expira_em=agora + datetime.timedelta(seconds=IDEMPOTENCIA_RESERVA_SEGUNDOS)
+                ))
+                try:
+                    db.commit()
+                    return None
+                except IntegrityError:
+                    # Outro processo reservou a mesma chave ao mesmo tempo
+                    db.rollback()
+                    registro = db.get(RespostaIdempotente, chave)
+                    if registro is None:
+                        return self._reservar(chave, hash_requisicao)
+            return (registro.hash_requisicao, registro.status, registro.content_type, registro.corpo or b"")
+        finally:
+            db.close()
+
+    def _gravar(self, chave: str, resposta: Resposta):
+        db = obter_sessionmaker()()
+        try:
+            db.merge(RespostaIdempotente(
+                chave=chave,
+                hash_requisicao=resposta[0],
+                status=resposta[1],
+                content_type=resposta[2],
+                corpo=resposta[3],
+                expira_em=datetime.datetime.utcnow() + datetime.timedelta(seconds=IDEMPOTENCIA_VALIDADE_SEGUNDOS)
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _liberar(self, chave: str):
+        """
+        Remove a reserva de uma execução que não deve ser repetida (a próxima tentativa executa de novo)
+        """
+        db = obter_sessionmaker()()
+        try:
+            db.query(RespostaIdempotente).filter(
+                RespostaIdempotente.chave == chave,
+                RespostaIdempotente.status.is_(None)
+            ).delete()
+            db.commit()
+        finally:
+            db.close()
+
+    def _limpar_expirados(self, db, agora: datetime.datetime):
+        escola = escola_atual.get()
+        momento = time.monotonic()
+        if momento - self._ultima_limpeza.get(escola, 0.0) < IDEMPOTENCIA_LIMPEZA_SEGUNDOS:
+            return
+        self._ultima_limpeza[escola] = momento
+        db.query(RespostaIdempotente).filter(RespostaIdempotente.expira_em < agora).delete()
+        db.commit()
+
+    # === RESPOSTAS ===
+
+    @staticmethod
+    async def _ler_corpo(receive):
+        """
+        Lê o corpo inteiro da requisição e devolve um receive que o entrega de novo à rota
+        """
+        partes = []
+        while True:
+            mensagem = await receive()
+            if mensagem["type"] != "http.request":
+                break
+            partes.append(mensagem.get("body", b""))
+            if not mensagem.get("more_body", False):
+                break
+        corpo = b"".join(partes)
+        entregue = False
+
+        async def receber():
+            nonlocal entregue
+            if not entregue:
+                entregue = True
+                return {"type": "http.request", "body": corpo, "more_body": False}
+            return await receive()
+
+        return corpo, receber
+
+    async def _repetir(self, send, resposta: Resposta, hash_requisicao: str):
+        hash_original, status, content_type, corpo = resposta
+        if hash_original != hash_requisicao:
+            await self._responder_erro(send, 422, "Idempotency-Key já usada com outro corpo de requisição")
+            return
+        cabecalhos = [
+            (b"content-length", str(len(corpo)).encode()),
+            (b"idempotent-replayed", b"true"),
+        ]
+        if content_type:
+            cabecalhos.append((b"content-type", content_type.encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": cabecalhos})
+        await send({"type": "http.response.body", "body": corpo})
+
+    @staticmethod
+    async def _responder_erro(send, codigo: int, mensagem: str, extras: Optional[dict] = None):
+        corpo = json.dumps({"detail": mensagem}).encode("utf-8")
+        cabecalhos = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(corpo)).encode()),
+        ]
+        cabecalhos.extend((extras or {}).items())
+        await send({"type": "http.response.start", "status": codigo, "headers": cabecalhos})
+        await send({"type": "http.response.body", "body": corpo})
@@ -0,0 +1,413 @@
+"""
+Fila persistente de jobs para operações longas (exportações, estatísticas, backups...)
+Os jobs ficam na tabela jobs do SQLite e são executados fora do ciclo da requisição
+por um pool configurável de threads ou processos.
+
+Garantias:
+- Sobrevive a reinícios: um job "executando" cuja reserva (lease) expirou volta a ser elegível
+- Execução at-least-once: um job pode rodar mais de uma vez, então os handlers devem ser idempotentes
+- Cada reserva é uma tentativa numerada: só a tentativa que detém o lease renova, finaliza
+  ou devolve o job; um worker atrasado (lease já retomado por outro) não altera o estado
+- Retentativas até max_tentativas; submissões com a mesma chave_idempotencia devolvem o mesmo job
+
+A tabela jobs fica sempre no banco principal; no modo multi-escola cada job guarda a
+escola que o submeteu e o handler roda com essa escola como escola atual
+"""
+import datetime
+import importlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal, engine, escola_atual, obter_sessionmaker
+from models import Job, Aluno, Turma
+
+# Configurações da fila
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MODO = os.getenv("JOBS_MODO", "threads")  # threads ou processos
+JOBS_LEASE_SEGUNDOS = int(os.getenv("JOBS_LEASE_SEGUNDOS", "60"))
+JOBS_INTERVALO_POLL = float(os.getenv("JOBS_INTERVALO_POLL", "1.0"))
+
+# Handlers registrados: tipo -> (módulo, nome da função)
+# Guardados pelo nome para que o modo processos consiga importá-los no processo filho
+_handlers: Dict[str, Tuple[str, str]] = {}
+
+# Callbacks executados no processo do despachante quando um job do tipo conclui
+_ao_concluir: Dict[str, Callable[[dict], None]] = {}
+
+# Tipos que só administradores podem submeter pelo POST /jobs
+_tipos_admin: Set[str] = set()
+
+
+def registrar_job(tipo: str, ao_concluir: Optional[Callable[[dict], None]] = None, admin: bool = False):
+    """
+    Decorator que registra uma função como handler de um tipo de job
+    O handler recebe (job_id, parametros) e retorna um valor serializável em JSON
+    ao_concluir (opcional) recebe o resultado no processo da aplicação, mesmo no modo processos
+    admin=True restringe a submissão pelo POST /jobs aos administradores
+    """
+    def decorator(funcao: Callable):
+        _handlers[tipo] = (funcao.__module__, funcao.__name__)
+        if ao_concluir is not None:
+            _ao_concluir[tipo] = ao_concluir
+        if admin:
+            _tipos_admin.add(tipo)
+        return funcao
+    return decorator
+
+
+def tipos_registrados():
+    return sorted(_handlers)
+
+
+def exige_admin(tipo: str) -> bool:
+    return tipo in _tipos_admin
+
+
+def atualizar_progresso(job_id: int, progresso: int):
+    """
+    Registra o progresso (0-100) de um job em execução
+    """
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(Job.__table__)
+            .where(Job.__table__.c.id == job_id)
+            .values(progresso=max(0, min(100, int(progresso))), atualizado_em=datetime.datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def submeter_job(tipo: str, parametros: dict, usuario_id: Optional[int] = None,
+                 chave_idempotencia: Optional[str] = None) -> Job:
+    """
+    Cria um job pendente (ou devolve o existente com a mesma chave de idempotência)
+    """
+    if tipo not in _handlers:
+        raise ValueError(f"Tipo de job desconhecido: {tipo}")
+
+    escola = escola_atual.get()
+    if escola and chave_idempotencia:
+        # A chave é única por escola
+        chave_idempotencia = f"{escola}:{chave_idempotencia}"
+
+    db = SessionLocal()
+    try:
+        if chave_idempotencia:
+            existente = db.query(Job).filter(Job.chave_idempotencia == chave_idempotencia).first()
+            if existente:
+                return existente
+
+        job = Job(
+            tipo=tipo,
+            parametros=json.dumps(parametros),
+            chave_idempotencia=chave_idempotencia,
+            usuario_id=usuario_id,
+            escola=escola,
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Submissão concorrente com a mesma chave
+            db.rollback()
+            return db.query(Job).filter(Job.chave_idempotencia == chave_idempotencia).first()
+        db.refresh(job)
+    finally:
+        db.close()
+    fila_jobs.acordar()
+    return job
+
+
+def buscar_job(job_id: int) -> Optional[Job]:
+    """
+    Busca um job da escola atual
+    """
+    escola = escola_atual.get()
+    db = SessionLocal()
+    try:
+        filtro_escola = Job.escola.is_(None) if escola is None else Job.escola == escola
+        return db.query(Job).filter(Job.id == job_id, filtro_escola).first()
+    finally:
+        db.close()
+
+
+def _executar_handler(job_id: int, tipo: str, parametros: str, escola: Optional[str]) -> str:
+    """
+    Executa o handler do job (em thread ou processo filho) e serializa o resultado
+    """
+    modulo, nome = _handlers[tipo]
+    handler = getattr(importlib.import_module(modulo), nome)
+    token = escola_atual.set(escola)
+    try:
+        resultado = handler(job_id, json.loads(parametros))
+    finally:
+        escola_atual.reset(token)
+    return json.dumps(resultado, default=str)
+
+
+def _inicializar_processo():
+    # Conexões SQLite herdadas do processo pai não podem ser reutilizadas após o fork
+    engine.dispose(close=False)
+
+
+class FilaJobs:
+    """
+    Despachante que reserva jobs no banco e os executa no pool
+    """
+
+    def __init__(self, workers: int = JOBS_WORKERS, modo: str = JOBS_MODO):
+        self.workers = workers
+        self.modo = modo
+        self._executor = None
+        self._em_execucao: Dict[int, int] = {}  # job_id -> tentativa reservada por este worker
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._acordar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def acordar(self):
+        self._acordar.set()
+
+    # === RESERVA E FINALIZAÇÃO ===
+
+    def _reservar(self) -> Optional[Tuple[int, str, str, Optional[str], int]]:
+        """
+        Reserva atomicamente o próximo job elegível (pendente ou com lease expirado)
+        Retorna (id, tipo, parametros, escola, tentativa)
+        """
+        agora = datetime.datetime.utcnow()
+        elegivel = or_(
+            Job.status == "pendente",
+            and_(Job.status == "executando", Job.lease_ate < agora),
+        )
+        db = SessionLocal()
+        try:
+            while True:
+                candidato = db.query(
+                    Job.id, Job.tipo, Job.parametros, Job.escola, Job.status, Job.tentativas, Job.max_tentativas
+                ).filter(elegivel).order_by(Job.id).first()
+                if candidato is None:
+                    return None
+                if candidato.status == "executando" and candidato.tentativas >= candidato.max_tentativas:
+                    # Job abandonado que já esgotou as tentativas não volta a rodar
+                    db.query(Job).filter(Job.id == candidato.id, elegivel).update({
+                        "status": "falhou",
+                        "erro": "Lease expirado após o número máximo de tentativas",
+                        "lease_ate": None,
+                        "atualizado_em": agora,
+                    }, synchronize_session=False)
+                    db.commit()
+                    continue
+                # UPDATE condicional: só um worker (thread ou processo) consegue a reserva
+                reservados = db.query(Job).filter(Job.id == candidato.id, elegivel).update({
+                    "status": "executando",
+                    "tentativas": Job.tentativas + 1,
+                    "lease_ate": agora + datetime.timedelta(seconds=JOBS_LEASE_SEGUNDOS),
+                    "atualizado_em": agora,
+                }, synchronize_session=False)
+                db.commit()
+                if reservados == 1:
+                    return (candidato.id, candidato.tipo, candidato.parametros, candidato.escola,
+                            candidato.tentativas + 1)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _da_tentativa(job_id: int, tentativa: int):
+        """
+        Filtro do job ainda reservado pela tentativa informada
+        """
+        return Job.id == job_id, Job.status == "executando", Job.tentativas == tentativa
+
+    def _atualizar_tentativas(self, tentativas: Dict[int, int], valores: dict):
+        db = SessionLocal()
+        try:
+            for job_id, tentativa in tentativas.items():
+                db.query(Job).filter(*self._da_tentativa(job_id, tentativa))\
+                    .update(valores, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _renovar_leases(self):
+        with self._lock:
+            tentativas = dict(self._em_execucao)
+        if tentativas:
+            self._atualizar_tentativas(tentativas, {
+                "lease_ate": datetime.datetime.utcnow() + datetime.timedelta(seconds=JOBS_LEASE_SEGUNDOS),
+            })
+
+    def _finalizar(self, job_id: int, tentativa: int, futuro: Future):
+        with self._lock:
+            if self._em_execucao.get(job_id) == tentativa:
+                del self._em_execucao[job_id]
+        erro = futuro.exception() if not futuro.cancelled() else RuntimeError("Execução cancelada")
+        if erro is None:
+            valores = {"status": "concluido", "progresso": 100, "resultado": futuro.result(), "erro": None}
+        else:
+            valores = {
+                "status": case((Job.tentativas < Job.max_tentativas, "pendente"), else_="falhou"),
+                "erro": str(erro) or erro.__class__.__name__,
+            }
+        valores.update({"lease_ate": None, "atualizado_em": datetime.datetime.utcnow()})
+
+        db = SessionLocal()
+        try:
+            # UPDATE condicional: uma tentativa cujo lease expirou e foi retomado não finaliza o job
+            finalizados = db.query(Job).filter(*self._da_tentativa(job_id, tentativa))\
+                .update(valores, synchronize_session=False)
+            db.commit()
+            tipo = db.query(Job.tipo).filter(Job.id == job_id).scalar() if finalizados else None
+        finally:
+            db.close()
+        self._acordar.set()
+        if not finalizados:
+            print(f"Tentativa {tentativa} do job {job_id} terminou após perder o lease; resultado descartado")
+            return
+
+        callback = _ao_concluir.get(tipo)
+        if erro is None and callback is not None:
+            try:
+                callback(json.loads(futuro.result()))
+            except Exception as e:
+                print(f"Erro no callback de conclusão do job {job_id}: {e}")
+
+    # === LAÇO PRINCIPAL ===
+
+    def _executar(self):
+        ultima_renovacao = datetime.datetime.utcnow()
+        while not self._parar.is_set():
+            try:
+                while len(self._em_execucao) < self.workers and not self._parar.is_set():
+                    reservado = self._reservar()
+                    if reservado is None:
+                        break
+                    job_id, tipo, parametros, escola, tentativa = reservado
+                    with self._lock:
+                        self._em_execucao[job_id] = tentativa
+                    futuro = self._executor.submit(_executar_handler, job_id, tipo, parametros, escola)
+                    futuro.add_done_callback(
+                        lambda f, job_id=job_id, tentativa=tentativa: self._finalizar(job_id, tentativa, f)
+                    )
+
+                agora = datetime.datetime.utcnow()
+                if (agora - ultima_renovacao).total_seconds() >= JOBS_LEASE_SEGUNDOS / 3:
+                    self._renovar_leases()
+                    ultima_renovacao = agora
+            except Exception as e:
+                print(f"Erro na fila de jobs: {e}")
+
+            self._acordar.wait(JOBS_INTERVALO_POLL)
+            self._acordar.clear()
+
+    def iniciar(self):
+        """
+        Cria o pool de execução e inicia o despachante
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self.modo == "processos":
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_inicializar_processo)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="fila-jobs", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        """
+        Para de reservar jobs e libera os que estão em execução para outro worker
+        """
+        self._parar.set()
+        self._acordar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=JOBS_INTERVALO_POLL + 5)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+        with self._lock:
+            tentativas = dict(self._em_execucao)
+        if tentativas:
+            # Expira o lease para que outro worker (ou o próximo início) retome esses jobs
+            self._atualizar_tentativas(tentativas, {"lease_ate": datetime.datetime.utcnow()})
+
+
+# Instância única usada pela aplicação
+fila_jobs = FilaJobs()
+
+
+# === HANDLERS PADRÃO ===
+
+@registrar_job("estatisticas")
+def job_estatisticas(job_id: int, parametros: dict) -> dict:
+    """
+    Recalcula estatísticas gerais: alunos por status e ocupação de cada turma
+    """
+    db = obter_sessionmaker()()
+    try:
+        alunos_por_status = {
+            status: total for status, total in
+            db.query(Aluno.status, func.count(Aluno.id)).group_by(Aluno.status)
+        }
+        atualizar_progresso(job_id, 50)
+        ocupacao = dict(
+            db.query(Aluno.turma_id, func.count(Aluno.id))
+            .filter(Aluno.status == "ativo", Aluno.turma_id.isnot(None))
+            .group_by(Aluno.turma_id)
+        )
+        turmas = [
+            {"id": t.id, "nome": t.nome, "capacidade": t.capacidade, "ocupacao": ocupacao.get(t.id, 0)}
+            for t in db.query(Turma).order_by(Turma.id)
+        ]
+        return {
+            "total_alunos": sum(alunos_por_status.values()),
+            "alunos_por_status": alunos_por_status,
+            "turmas": turmas,
+            "gerado_em": datetime.datetime.utcnow().isoformat(),
+        }
+    finally:
+        db.close()
+
+
+@registrar_job("exportar_alunos")
+def job_exportar_alunos(job_id: int, parametros: dict) -> list:
+    """
+    Exporta todos os alunos (com nome da turma), em lotes, registrando o progresso
+    """
+    tamanho_lote = int(parametros.get("tamanho_lote", 500))
+    db = obter_sessionmaker()()
+    try:
+        total = db.query(func.count(Aluno.id)).scalar() or 0
+        nomes_turma = dict(db.query(Turma.id, Turma.nome))
+        exportados = []
+        ultimo_id = 0
+        while True:
+            lote = db.query(Aluno).filter(Aluno.id > ultimo_id).order_by(Aluno.id).limit(tamanho_lote).all()
+            if not lote:
+                break
+            for aluno in lote:
+                exportados.append({
+                    "id": aluno.id,
+                    "nome": aluno.nome,
+                    "data_nascimento": aluno.data_nascimento.isoformat(),
+                    "email": aluno.email,
+                    "status": aluno.status,
+                    "turma_id": aluno.turma_id,
+                    "turma_nome": nomes_turma.get(aluno.turma_id),
+                })
+            ultimo_id = lote[-1].id
+            if total:
+                atualizar_progresso(job_id, len(exportados) * 100 // total)
+        return exportados
+    finally:
+        db.close()
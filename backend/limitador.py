@@ -0,0 +1,200 @@
+"""
+Controle de admissão e limite de requisições por cliente
+Middleware ASGI com token bucket por usuário (claim "sub" do JWT) e por IP,
+orçamentos separados para rotas caras e limite global de requisições em andamento.
+Quando o orçamento acaba, responde 429/503 imediatamente com Retry-After em vez de enfileirar.
+As sub-requisições do POST /batch não passam pelo middleware e consomem o orçamento
+das suas rotas por orcamento_subrequisicao
+"""
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from auth import decodificar_token
+
+# Limite global de requisições sendo processadas ao mesmo tempo pelo worker
+MAX_REQUISICOES_EM_ANDAMENTO = int(os.getenv("MAX_REQUISICOES_EM_ANDAMENTO", "64"))
+
+# Orçamento padrão por cliente: (capacidade do bucket, tokens repostos por segundo)
+LIMITE_PADRAO_USUARIO = (60, 20.0)
+LIMITE_PADRAO_IP = (120, 40.0)
+
+# Orçamentos separados para rotas caras: (método, prefixo do caminho, capacidade, taxa)
+LIMITES_ROTAS_CARAS: List[Tuple[str, str, int, float]] = [
+    ("GET", "/alunos", 10, 2.0),
+    ("POST", "/auth/login", 5, 0.2),
+    ("POST", "/batch", 10, 2.0),
+    ("POST", "/jobs", 5, 0.5),
+]
+
+# Quantidade máxima de buckets mantidos em memória (os mais antigos são descartados)
+MAX_BUCKETS = 10000
+
+# Se True, usa o primeiro IP do cabeçalho X-Forwarded-For (apenas atrás de proxy confiável)
+CONFIAR_X_FORWARDED_FOR = os.getenv("CONFIAR_X_FORWARDED_FOR", "0") == "1"
+
+
+class TokenBuckets:
+    """
+    Conjunto de token buckets indexados por chave, com descarte LRU
+    """
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def consumir(self, chave: str, capacidade: int, taxa: float, agora: float) -> float:
+        """
+        Tenta consumir um token do bucket
+        Retorna 0 se liberado, senão os segundos até haver um token disponível
+        """
+        bucket = self._buckets.get(chave)
+        if bucket is None:
+            bucket = [float(capacidade), agora]
+            self._buckets[chave] = bucket
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(chave)
+            bucket[0] = min(float(capacidade), bucket[0] + (agora - bucket[1]) * taxa)
+            bucket[1] = agora
+
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+        return (1.0 - bucket[0]) / taxa
+
+
+# Buckets de todos os clientes, compartilhados pelo middleware e pelo POST /batch
+buckets_clientes = TokenBuckets()
+
+
+class LimitadorRequisicoes:
+    """
+    Middleware ASGI de controle de admissão
+    """
+
+    def __init__(self, app, max_em_andamento: int = MAX_REQUISICOES_EM_ANDAMENTO):
+        self.app = app
+        self.max_em_andamento = max_em_andamento
+        self.em_andamento = 0
+        self.buckets = buckets_clientes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        if self.em_andamento >= self.max_em_andamento:
+            await self._rejeitar(send, 503, 1, "Servidor sobrecarregado, tente novamente em instantes")
+            return
+
+        espera = self._verificar_orcamento(scope)
+        if espera > 0:
+            await self._rejeitar(send, 429, espera, "Muitas requisições, tente novamente em instantes")
+            return
+
+        self.em_andamento += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.em_andamento -= 1
+
+    def _verificar_orcamento(self, scope) -> float:
+        """
+        Consome os buckets aplicáveis à requisição
+        Retorna 0 se liberada, senão o maior tempo de espera entre os buckets esgotados
+        """
+        agora = time.monotonic()
+        clientes = self._clientes(scope)
+
+        espera = 0.0
+        for chave, (capacidade, taxa) in clientes:
+            espera = max(espera, self.buckets.consumir(chave, capacidade, taxa, agora))
+
+        rota = self._rota_cara(scope["method"], scope["path"])
+        if rota is not None:
+            prefixo, capacidade, taxa = rota
+            # Rotas caras são limitadas pelo usuário quando autenticado, senão pelo IP
+            chave_cliente = clientes[-1][0]
+            espera = max(espera, self.buckets.consumir(f"{prefixo}|{chave_cliente}", capacidade, taxa, agora))
+        return espera
+
+    @classmethod
+    def _clientes(cls, scope) -> List[Tuple[str, Tuple[int, float]]]:
+        """
+        Chaves de cliente da requisição com seus orçamentos: o IP e, se autenticado, o usuário
+        """
+        clientes = [("ip:" + cls._ip_cliente(scope), LIMITE_PADRAO_IP)]
+        usuario = cls._usuario_token(scope)
+        if usuario:
+            clientes.append(("usuario:" + usuario, LIMITE_PADRAO_USUARIO))
+        return clientes
+
+    @staticmethod
+    def _rota_cara(metodo: str, caminho: str) -> Optional[Tuple[str, int, float]]:
+        for metodo_rota, prefixo, capacidade, taxa in LIMITES_ROTAS_CARAS:
+            if metodo == metodo_rota and (caminho == prefixo or caminho.startswith(prefixo + "/")):
+                return f"{metodo_rota} {prefixo}", capacidade, taxa
+        return None
+
+    @staticmethod
+    def _cabecalhos(scope) -> Dict[bytes, bytes]:
+        return {nome.lower(): valor for nome, valor in scope.get("headers", [])}
+
+    @classmethod
+    def _ip_cliente(cls, scope) -> str:
+        if CONFIAR_X_FORWARDED_FOR:
+            encaminhado = cls._cabecalhos(scope).get(b"x-forwarded-for")
+            if encaminhado:
+                return encaminhado.decode("latin-1").split(",")[0].strip()
+        cliente = scope.get("client")
+        return cliente[0] if cliente else "desconhecido"
+
+    @classmethod
+    def _usuario_token(cls, scope) -> Optional[str]:
+        """
+        Extrai o "sub" de um Bearer token válido (sem acessar o banco)
+        No modo multi-escola o usuário é identificado também pela escola do token
+        """
+        autorizacao = cls._cabecalhos(scope).get(b"authorization")
+        if not autorizacao or not autorizacao.lower().startswith(b"bearer "):
+            return None
+        payload = decodificar_token(autorizacao[7:].decode("latin-1"))
+        if payload is None:
+            return None
+        sub = payload.get("sub")
+        if sub and payload.get("escola"):
+            return f"{payload['escola']}/{sub}"
+        return sub
+
+    @staticmethod
+    async def _rejeitar(send, codigo: int, espera: float, mensagem: str):
+        corpo = json.dumps({"detail": mensagem}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": codigo,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(corpo)).encode()),
+                (b"retry-after", str(max(1, math.ceil(espera))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": corpo})
+
+
+def orcamento_subrequisicao(scope_batch, metodo: str, caminho: str) -> float:
+    """
+    Consome o orçamento de rota cara de uma sub-requisição do POST /batch, no mesmo
+    bucket (rota + cliente do batch) que a requisição direta usaria
+    Retorna 0 se liberada, senão os segundos até haver um token disponível
+    """
+    rota = LimitadorRequisicoes._rota_cara(metodo, caminho)
+    if rota is None:
+        return 0.0
+    prefixo, capacidade, taxa = rota
+    chave_cliente = LimitadorRequisicoes._clientes(scope_batch)[-1][0]
+    return buckets_clientes.consumir(f"{prefixo}|{chave_cliente}", capacidade, taxa, time.monotonic())
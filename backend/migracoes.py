@@ -0,0 +1,189 @@
+"""
+Versionamento do esquema do banco com migrações incrementais
+A versão aplicada fica na tabela schema_versao. Na inicialização basta uma consulta
+para confirmar que o banco está atualizado; só quando há migrações pendentes o
+processo obtém um lock exclusivo do SQLite e as aplica, de modo que com vários
+workers apenas um migra e os demais esperam e encontram o banco já atualizado.
+
+Cada migração deve poder rodar sobre um banco criado pela migração 1 com os
+modelos atuais (use criar_tabela e adicionar_coluna, que ignoram o que já existe).
+
+Uso pela linha de comando (ex.: no deploy, antes de subir os workers):
+    python migracoes.py
+"""
+import datetime
+import os
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+import models  # noqa: F401  (registra as tabelas em Base.metadata)
+import duplicados  # Também registra os eventos que mantêm o índice de duplicados
+from database import Base
+
+# Tempo máximo de espera pelo lock enquanto outro processo aplica as migrações
+MIGRACAO_ESPERA_MS = int(os.getenv("MIGRACAO_ESPERA_MS", "60000"))
+
+
+# === FUNÇÕES AUXILIARES ===
+
+def criar_tabela(conexao: Connection, modelo):
+    modelo.__table__.create(bind=conexao, checkfirst=True)
+
+
+def adicionar_coluna(conexao: Connection, tabela: str, coluna: str, definicao: str):
+    """
+    ALTER TABLE ADD COLUMN apenas se a coluna ainda não existir
+    """
+    existentes = {linha[1] for linha in conexao.exec_driver_sql(f"PRAGMA table_info({tabela})")}
+    if coluna not in existentes:
+        conexao.exec_driver_sql(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+
+
+# === MIGRAÇÕES ===
+
+def _m001_esquema_inicial(conexao: Connection):
+    # Cria as tabelas ausentes (banco novo ou anterior ao versionamento)
+    Base.metadata.create_all(bind=conexao)
+
+
+def _m002_escola_dos_jobs(conexao: Connection):
+    adicionar_coluna(conexao, "jobs", "escola", "VARCHAR(50)")
+    conexao.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_jobs_escola ON jobs (escola)")
+
+
+def _m003_arquivo_de_alunos(conexao: Connection):
+    adicionar_coluna(conexao, "alunos", "inativo_desde", "DATE")
+    conexao.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_alunos_inativo_desde ON alunos (inativo_desde)")
+    # Sem o histórico, os inativos existentes passam a contar a partir da migração
+    conexao.execute(
+        text("UPDATE alunos SET inativo_desde = :hoje WHERE status = 'inativo' AND inativo_desde IS NULL"),
+        {"hoje": datetime.date.today().isoformat()}
+    )
+    criar_tabela(conexao, models.AlunoArquivado)
+
+
+def _m004_indice_de_duplicados(conexao: Connection):
+    criar_tabela(conexao, models.AlunoTrigrama)
+    # Preenche o índice com os alunos existentes (banco novo: tabela vazia)
+    conexao.exec_driver_sql("DELETE FROM alunos_trigramas")
+    resultado = conexao.execute(
+        text("SELECT id, nome, data_nascimento FROM alunos ORDER BY id")
+    ).yield_per(1000)
+    for lote in resultado.partitions():
+        duplicados.indexar(conexao, [
+            (aluno_id, nome, datetime.date.fromisoformat(data)) for aluno_id, nome, data in lote
+        ])
+
+
+def _m005_usuarios_admin(conexao: Connection):
+    # Sem preenchimento: um "admin" já existente pode ter sido registrado por qualquer um
+    # pelo /auth/register, então é promovido manualmente (python criar_admin.py --promover)
+    adicionar_coluna(conexao, "usuarios", "admin", "BOOLEAN NOT NULL DEFAULT 0")
+
+
+def _m006_ids_de_alunos_sem_reuso(conexao: Connection):
+    tabela = conexao.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'alunos'"
+    ).scalar()
+    if "AUTOINCREMENT" not in tabela.upper():
+        # O SQLite não altera a chave primária: recria a tabela com AUTOINCREMENT, mantendo os ids
+        conexao.exec_driver_sql("ALTER TABLE alunos RENAME TO alunos_antigo")
+        indices = conexao.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'alunos_antigo' AND sql IS NOT NULL"
+        ).scalars().all()
+        for indice in indices:
+            conexao.exec_driver_sql(f"DROP INDEX {indice}")
+        criar_tabela(conexao, models.Aluno)
+        colunas = ", ".join(coluna.name for coluna in models.Aluno.__table__.columns)
+        conexao.exec_driver_sql(f"INSERT INTO alunos ({colunas}) SELECT {colunas} FROM alunos_antigo")
+        conexao.exec_driver_sql("DROP TABLE alunos_antigo")
+    # Os ids já arquivados continuam expostos pelo GET /alunos?incluir_arquivo=true
+    conexao.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'alunos'")
+    conexao.exec_driver_sql(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'alunos', MAX(COALESCE(("
+        "SELECT MAX(id) FROM alunos), 0), COALESCE((SELECT MAX(aluno_id) FROM alunos_arquivo), 0))"
+    )
+
+
+# (versão, descrição, função) em ordem crescente de versão
+MIGRACOES: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "esquema inicial", _m001_esquema_inicial),
+    (2, "coluna escola em jobs", _m002_escola_dos_jobs),
+    (3, "arquivo de alunos inativos", _m003_arquivo_de_alunos),
+    (4, "índice de blocagem de duplicados", _m004_indice_de_duplicados),
+    (5, "coluna admin em usuarios", _m005_usuarios_admin),
+    (6, "ids de alunos sem reaproveitamento", _m006_ids_de_alunos_sem_reuso),
+]
+
+VERSAO_ESQUEMA = MIGRACOES[-1][0]
+
+
+def _versao_banco(conexao: Connection) -> int:
+    existe = conexao.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_versao'"
+    ).first()
+    if existe is None:
+        return 0
+    return conexao.exec_driver_sql("SELECT MAX(versao) FROM schema_versao").scalar() or 0
+
+
+def aplicar_migracoes(engine_banco: Engine) -> int:
+    """
+    Garante que o banco esteja na versão atual do esquema
+    Retorna a quantidade de migrações aplicadas por este processo
+    """
+    # AUTOCOMMIT entrega o controle da transação ao BEGIN EXCLUSIVE abaixo
+    with engine_banco.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+        conexao.exec_driver_sql(f"PRAGMA busy_timeout = {MIGRACAO_ESPERA_MS}")
+        if _versao_banco(conexao) >= VERSAO_ESQUEMA:
+            return 0
+
+        conexao.exec_driver_sql("BEGIN EXCLUSIVE")
+        try:
+            # Outro processo pode ter migrado enquanto este esperava o lock
+            versao = _versao_banco(conexao)
+            conexao.exec_driver_sql(
+                "CREATE TABLE IF NOT EXISTS schema_versao ("
+                "versao INTEGER PRIMARY KEY, descricao VARCHAR(200) NOT NULL, aplicada_em DATETIME NOT NULL)"
+            )
+            aplicadas = 0
+            for numero, descricao, migracao in MIGRACOES:
+                if numero <= versao:
+                    continue
+                migracao(conexao)
+                conexao.execute(
+                    text("INSERT INTO schema_versao (versao, descricao, aplicada_em) VALUES (:v, :d, :a)"),
+                    {"v": numero, "d": descricao, "a": datetime.datetime.utcnow().isoformat(" ")}
+                )
+                aplicadas += 1
+            conexao.exec_driver_sql("COMMIT")
+        except Exception:
+            conexao.exec_driver_sql("ROLLBACK")
+            raise
+    if aplicadas:
+        print(f"Esquema do banco atualizado para a versão {VERSAO_ESQUEMA} ({aplicadas} migrações)")
+    return aplicadas
+
+
+def apagar_esquema(engine_banco: Engine):
+    """
+    Remove todas as tabelas, inclusive o controle de versão (usado pelo seed.py)
+    """
+    Base.metadata.drop_all(bind=engine_banco)
+    with engine_banco.begin() as conexao:
+        conexao.exec_driver_sql("DROP TABLE IF EXISTS schema_versao")
+
+
+if __name__ == "__main__":
+    from database import ESCOLAS_DIRETORIO, MULTI_ESCOLA, cache_engines, engine
+
+    aplicar_migracoes(engine)
+    if MULTI_ESCOLA and os.path.isdir(ESCOLAS_DIRETORIO):
+        # Abrir o engine de uma escola aplica as migrações pendentes do seu banco
+        for arquivo in sorted(os.listdir(ESCOLAS_DIRETORIO)):
+            if arquivo.endswith(".db"):
+                cache_engines.obter(arquivo[:-3])
+        cache_engines.fechar_todos()
+    print(f"Banco na versão {VERSAO_ESQUEMA} do esquema")
@@ -2,11 +2,20 @@
 Modelos de dados usando SQLAlchemy ORM
 Define as tabelas Turma, Aluno e Usuario com seus relacionamentos
 """
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, Boolean, DateTime, Text, LargeBinary
+from sqlalchemy.orm import relationship, validates
 from database import Base
 import datetime
 
+def calcular_idade(data_nascimento: datetime.date) -> int:
+    """
+    Idade em anos completos na data de hoje
+    """
+    hoje = datetime.date.today()
+    return hoje.year - data_nascimento.year - (
+        (hoje.month, hoje.day) < (data_nascimento.month, data_nascimento.day)
+    )
+
 class Turma(Base):
     """
     Modelo da tabela Turma
@@ -31,6 +40,8 @@ class Aluno(Base):
     Representa um estudante com informações pessoais e status de matrícula
     """
     __tablename__ = "alunos"
+    # AUTOINCREMENT: o id de um aluno excluído ou arquivado nunca é reaproveitado
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String(80), nullable=False)                    # Nome obrigatório (3-80 chars)
@@ -38,6 +49,7 @@ class Aluno(Base):
     email = Column(String(255), nullable=True, unique=True)     # Email único (opcional)
     status = Column(String(20), nullable=False, default="inativo")  # ativo/inativo
     turma_id = Column(Integer, ForeignKey("turmas.id"), nullable=True)  # FK para turma (opcional)
+    inativo_desde = Column(Date, nullable=True, index=True)      # Data em que ficou inativo (arquivamento)
     
     # Relacionamento com Turma (muitos para um)
     turma = relationship("Turma", back_populates="alunos")
@@ -45,16 +57,63 @@ class Aluno(Base):
     def __repr__(self):
         return f"<Aluno(id={self.id}, nome='{self.nome}', status='{self.status}')>"
     
+    @validates("status")
+    def registrar_inatividade(self, chave, status):
+        """
+        Mantém inativo_desde: preenchido quando o aluno fica inativo, limpo quando volta a ativo
+        """
+        if status != "inativo":
+            self.inativo_desde = None
+        elif self.status != "inativo" or self.inativo_desde is None:
+            self.inativo_desde = datetime.date.today()
+        return status
+    
     @property
     def idade(self):
         """
         Calcula a idade do aluno baseada na data de nascimento
         Retorna a idade em anos completos
         """
-        hoje = datetime.date.today()
-        return hoje.year - self.data_nascimento.year - (
-            (hoje.month, hoje.day) < (self.data_nascimento.month, self.data_nascimento.day)
-        )
+        return calcular_idade(self.data_nascimento)
+
+class AlunoArquivado(Base):
+    """
+    Modelo da tabela AlunoArquivado
+    Alunos inativos há muito tempo, movidos da tabela alunos pelo arquivamento em lotes
+    """
+    __tablename__ = "alunos_arquivo"
+    
+    id = Column(Integer, primary_key=True)
+    aluno_id = Column(Integer, nullable=False, index=True)      # id original na tabela alunos
+    nome = Column(String(80), nullable=False)
+    data_nascimento = Column(Date, nullable=False)
+    email = Column(String(255), nullable=True, index=True)
+    status = Column(String(20), nullable=False)
+    turma_id = Column(Integer, nullable=True)
+    inativo_desde = Column(Date, nullable=True)
+    arquivado_em = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AlunoArquivado(aluno_id={self.aluno_id}, nome='{self.nome}')>"
+    
+    @property
+    def idade(self):
+        return calcular_idade(self.data_nascimento)
+
+class AlunoTrigrama(Base):
+    """
+    Modelo da tabela AlunoTrigrama
+    Índice de blocagem para detectar duplicados: trigramas do nome normalizado por data de nascimento
+    A chave primária (data_nascimento, trigrama, aluno_id) atende a busca por bloco
+    """
+    __tablename__ = "alunos_trigramas"
+    
+    data_nascimento = Column(Date, primary_key=True)
+    trigrama = Column(String(3), primary_key=True)
+    aluno_id = Column(Integer, primary_key=True, index=True)    # Sem FK: mantido pelos eventos de Aluno
+    
+    def __repr__(self):
+        return f"<AlunoTrigrama(aluno_id={self.aluno_id}, trigrama='{self.trigrama}')>"
 
 class Usuario(Base):
     """
@@ -69,8 +128,67 @@ class Usuario(Base):
     senha_hash = Column(String(255), nullable=False)             # Senha criptografada
     nome_completo = Column(String(100), nullable=False)          # Nome completo do usuário
     ativo = Column(Boolean, default=True, nullable=False)        # Se o usuário está ativo
+    admin = Column(Boolean, default=False, nullable=False)       # Acesso às rotas administrativas
     data_criacao = Column(DateTime, default=datetime.datetime.utcnow)  # Data de criação
     ultimo_login = Column(DateTime, nullable=True)               # Último login
     
     def __repr__(self):
         return f"<Usuario(id={self.id}, username='{self.username}', ativo={self.ativo})>"
+
+class TokenRevogado(Base):
+    """
+    Modelo da tabela TokenRevogado
+    Registra tokens JWT revogados no logout até a data de expiração do token
+    """
+    __tablename__ = "tokens_revogados"
+    
+    jti = Column(String(32), primary_key=True)                      # Identificador único do token
+    expira_em = Column(DateTime, nullable=False, index=True)        # Expiração original do token
+    revogado_em = Column(DateTime, nullable=False, index=True,
+                         default=datetime.datetime.utcnow)          # Momento do logout
+    
+    def __repr__(self):
+        return f"<TokenRevogado(jti='{self.jti}', expira_em={self.expira_em})>"
+
+class Job(Base):
+    """
+    Modelo da tabela Job
+    Representa uma operação longa executada em segundo plano pela fila de jobs
+    """
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String(50), nullable=False)                        # Nome do handler registrado
+    parametros = Column(Text, nullable=False, default="{}")          # Parâmetros em JSON
+    chave_idempotencia = Column(String(100), nullable=True, unique=True)  # Evita jobs duplicados
+    status = Column(String(20), nullable=False, default="pendente", index=True)  # pendente/executando/concluido/falhou
+    progresso = Column(Integer, nullable=False, default=0)           # Percentual (0-100)
+    resultado = Column(Text, nullable=True)                          # Resultado em JSON
+    erro = Column(Text, nullable=True)                               # Mensagem do último erro
+    tentativas = Column(Integer, nullable=False, default=0)          # Execuções iniciadas
+    max_tentativas = Column(Integer, nullable=False, default=3)
+    lease_ate = Column(DateTime, nullable=True)                      # Fim da reserva pelo worker atual
+    usuario_id = Column(Integer, nullable=True)                      # Quem submeteu
+    escola = Column(String(50), nullable=True, index=True)           # Escola do job (modo multi-escola)
+    criado_em = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    atualizado_em = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, tipo='{self.tipo}', status='{self.status}')>"
+
+class RespostaIdempotente(Base):
+    """
+    Modelo da tabela RespostaIdempotente
+    Guarda a primeira resposta de um POST com Idempotency-Key para repeti-la nas novas tentativas
+    """
+    __tablename__ = "respostas_idempotentes"
+    
+    chave = Column(String(64), primary_key=True)                     # sha256 de rota + Idempotency-Key
+    hash_requisicao = Column(String(64), nullable=False)             # sha256 do corpo da requisição
+    status = Column(Integer, nullable=True)                          # Nulo enquanto em andamento
+    content_type = Column(String(100), nullable=True)
+    corpo = Column(LargeBinary, nullable=True)
+    expira_em = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<RespostaIdempotente(chave='{self.chave}', status={self.status})>"
@@ -0,0 +1,197 @@
+"""
+Profiler por amostragem do worker em execução
+Coleta periodicamente as pilhas de todas as threads (sys._current_frames) e as agrega
+no formato "collapsed stack" (uma pilha por linha + contagem), aceito por flamegraph.pl,
+speedscope e inferno.
+
+Modos:
+- wall: todas as amostras, incluindo threads paradas esperando I/O ou locks
+- cpu: descarta amostras cujo frame do topo é uma espera conhecida (heurística,
+  o Python não expõe o estado de CPU de outras threads)
+
+Também oferece o profiling amostrado de requisições: uma fração configurável das
+requisições de rotas escolhidas é perfilada e os N perfis mais lentos ficam em memória
+"""
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# Intervalo entre amostras (segundos)
+PROFILER_INTERVALO_AMOSTRA = float(os.getenv("PROFILER_INTERVALO_AMOSTRA", "0.005"))
+
+# Duração máxima de uma captura sob demanda (segundos)
+PROFILER_DURACAO_MAXIMA = 60.0
+
+# Profiling amostrado de requisições: fração (0 desliga) e prefixos de rota
+PROFILER_FRACAO_REQUISICOES = float(os.getenv("PROFILER_FRACAO_REQUISICOES", "0"))
+PROFILER_ROTAS = [r for r in os.getenv("PROFILER_ROTAS", "/alunos,/turmas,/matriculas").split(",") if r]
+
+# Quantidade de perfis mais lentos mantidos em memória
+PROFILER_MAX_PERFIS = int(os.getenv("PROFILER_MAX_PERFIS", "20"))
+
+# Funções no topo da pilha que indicam thread ociosa (ignoradas no modo cpu)
+FUNCOES_ESPERA = {
+    "wait", "select", "poll", "epoll", "accept", "recv", "recv_into", "read", "readinto",
+    "sleep", "acquire", "_wait_for_tstate_lock", "get", "_worker", "run_forever", "_run_once",
+}
+
+# Garante uma única captura sob demanda por vez
+_captura_lock = threading.Lock()
+
+
+def _pilha_colapsada(frame) -> str:
+    """
+    Converte uma pilha de frames em "arquivo:funcao;arquivo:funcao;..." (raiz primeiro)
+    """
+    partes = []
+    while frame is not None:
+        codigo = frame.f_code
+        partes.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+        frame = frame.f_back
+    partes.reverse()
+    return ";".join(partes)
+
+
+def _ociosa(frame) -> bool:
+    return frame.f_code.co_name in FUNCOES_ESPERA
+
+
+class Amostrador:
+    """
+    Thread que amostra as pilhas das demais threads em intervalo fixo
+    """
+
+    def __init__(self, modo: str = "wall", intervalo: float = PROFILER_INTERVALO_AMOSTRA):
+        self.modo = modo
+        self.intervalo = intervalo
+        self.pilhas: Counter = Counter()
+        self.amostras = 0
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _executar(self):
+        proprio = threading.get_ident()
+        nomes = {}
+        while not self._parar.is_set():
+            if len(nomes) != threading.active_count():
+                nomes = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == proprio:
+                    continue
+                if self.modo == "cpu" and _ociosa(frame):
+                    continue
+                self.pilhas[nomes.get(ident, str(ident)) + ";" + _pilha_colapsada(frame)] += 1
+            self.amostras += 1
+            self._parar.wait(self.intervalo)
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name="profiler-amostrador", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> Counter:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.pilhas
+
+
+def formatar_colapsado(pilhas: Counter) -> str:
+    """
+    Gera o texto no formato collapsed stack (entrada de flamegraph)
+    """
+    return "".join(f"{pilha} {contagem}\n" for pilha, contagem in pilhas.most_common())
+
+
+def capturar_perfil(segundos: float, modo: str = "wall") -> Optional[str]:
+    """
+    Captura um perfil do processo por alguns segundos
+    Retorna None se já houver outra captura em andamento
+    """
+    if not _captura_lock.acquire(blocking=False):
+        return None
+    try:
+        amostrador = Amostrador(modo)
+        amostrador.iniciar()
+        time.sleep(min(segundos, PROFILER_DURACAO_MAXIMA))
+        return formatar_colapsado(amostrador.parar())
+    finally:
+        _captura_lock.release()
+
+
+class PerfisLentos:
+    """
+    Guarda os N perfis de requisição mais lentos (min-heap pela duração)
+    """
+
+    def __init__(self, max_perfis: int = PROFILER_MAX_PERFIS):
+        self.max_perfis = max_perfis
+        self._heap: List[Tuple[float, int, dict]] = []
+        self._contador = itertools.count()
+        self._lock = threading.Lock()
+
+    def registrar(self, duracao: float, metodo: str, caminho: str, pilhas: Counter):
+        with self._lock:
+            if len(self._heap) >= self.max_perfis and duracao <= self._heap[0][0]:
+                return
+            perfil = {
+                "id": next(self._contador),
+                "metodo": metodo,
+                "caminho": caminho,
+                "duracao_ms": round(duracao * 1000, 2),
+                "capturado_em": time.time(),
+                "pilhas": pilhas,
+            }
+            item = (duracao, perfil["id"], perfil)
+            if len(self._heap) >= self.max_perfis:
+                heapq.heapreplace(self._heap, item)
+            else:
+                heapq.heappush(self._heap, item)
+
+    def listar(self) -> List[dict]:
+        with self._lock:
+            itens = sorted(self._heap, reverse=True)
+        return [{k: v for k, v in perfil.items() if k != "pilhas"} for _, _, perfil in itens]
+
+    def obter(self, perfil_id: int) -> Optional[dict]:
+        with self._lock:
+            for _, _, perfil in self._heap:
+                if perfil["id"] == perfil_id:
+                    return perfil
+        return None
+
+
+perfis_lentos = PerfisLentos()
+
+
+class ProfilerRequisicoesMiddleware:
+    """
+    Middleware ASGI que perfila uma fração das requisições das rotas configuradas
+    As amostras cobrem todas as threads do processo durante a requisição; sob
+    concorrência alta o perfil inclui trabalho de outras requisições simultâneas
+    """
+
+    def __init__(self, app, fracao: float = PROFILER_FRACAO_REQUISICOES, rotas: List[str] = PROFILER_ROTAS):
+        self.app = app
+        self.fracao = fracao
+        self.rotas = tuple(rotas)
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or self.fracao <= 0
+                or not scope["path"].startswith(self.rotas) or random.random() >= self.fracao):
+            await self.app(scope, receive, send)
+            return
+
+        amostrador = Amostrador("cpu")
+        amostrador.iniciar()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duracao = time.perf_counter() - inicio
+            perfis_lentos.registrar(duracao, scope["method"], scope["path"], amostrador.parar())
@@ -0,0 +1,178 @@
+"""
+Revogação de tokens JWT (logout real) sem consulta ao banco por requisição
+Os jti revogados ficam persistidos na tabela tokens_revogados e são verificados em memória:
+um filtro de Bloom descarta quase todos os tokens válidos com poucas operações de bits
+e só os "talvez revogados" consultam o conjunto exato.
+
+Cada worker sincroniza periodicamente com o banco (revogações feitas em outros workers
+passam a valer em até REVOGACAO_SINCRONIZACAO_SEGUNDOS) e descarta entradas expiradas
+"""
+import datetime
+import hashlib
+import math
+import os
+import threading
+from typing import Dict, Optional
+
+from database import SessionLocal
+from models import TokenRevogado
+
+# Intervalo de sincronização com o banco e limpeza de expirados
+REVOGACAO_SINCRONIZACAO_SEGUNDOS = float(os.getenv("REVOGACAO_SINCRONIZACAO_SEGUNDOS", "5"))
+
+# Dimensionamento do filtro de Bloom
+REVOGACAO_CAPACIDADE_INICIAL = 10000
+REVOGACAO_TAXA_FALSO_POSITIVO = 0.001
+
+# Margem de sobreposição na sincronização incremental (commits atrasados de outros workers)
+REVOGACAO_MARGEM_SINCRONIZACAO = datetime.timedelta(seconds=60)
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom com double hashing sobre um digest blake2b
+    """
+
+    def __init__(self, capacidade: int, taxa_falso_positivo: float = REVOGACAO_TAXA_FALSO_POSITIVO):
+        capacidade = max(capacidade, 1)
+        self.capacidade = capacidade
+        self.num_bits = max(64, int(-capacidade * math.log(taxa_falso_positivo) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacidade * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.itens = 0
+
+    def _posicoes(self, chave: str):
+        digest = hashlib.blake2b(chave.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def adicionar(self, chave: str):
+        for posicao in self._posicoes(chave):
+            self.bits[posicao >> 3] |= 1 << (posicao & 7)
+        self.itens += 1
+
+    def contem(self, chave: str) -> bool:
+        for posicao in self._posicoes(chave):
+            if not self.bits[posicao >> 3] & (1 << (posicao & 7)):
+                return False
+        return True
+
+
+class RevogacaoTokens:
+    """
+    Conjunto de jti revogados: Bloom + mapa exato jti -> expiração
+    """
+
+    def __init__(self, intervalo: float = REVOGACAO_SINCRONIZACAO_SEGUNDOS):
+        self.intervalo = intervalo
+        self._exatos: Dict[str, datetime.datetime] = {}
+        self._bloom = FiltroBloom(REVOGACAO_CAPACIDADE_INICIAL)
+        self._ultima_sincronizacao: Optional[datetime.datetime] = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def revogado(self, jti: str) -> bool:
+        """
+        Verifica se um jti foi revogado (caminho quente da autenticação)
+        """
+        if not self._bloom.contem(jti):
+            return False
+        expira_em = self._exatos.get(jti)
+        return expira_em is not None and expira_em > datetime.datetime.utcnow()
+
+    def revogar(self, jti: str, expira_em: datetime.datetime):
+        """
+        Revoga um token até sua expiração, persistindo no banco
+        """
+        db = SessionLocal()
+        try:
+            db.merge(TokenRevogado(jti=jti, expira_em=expira_em, revogado_em=datetime.datetime.utcnow()))
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            self._adicionar(jti, expira_em)
+
+    def _adicionar(self, jti: str, expira_em: datetime.datetime):
+        if jti in self._exatos:
+            return
+        self._exatos[jti] = expira_em
+        if self._bloom.itens >= self._bloom.capacidade:
+            self._reconstruir_bloom()
+        else:
+            self._bloom.adicionar(jti)
+
+    def _reconstruir_bloom(self):
+        """
+        Recria o filtro a partir do conjunto exato (remove expirados e redimensiona)
+        """
+        novo = FiltroBloom(max(REVOGACAO_CAPACIDADE_INICIAL, len(self._exatos) * 2))
+        for jti in self._exatos:
+            novo.adicionar(jti)
+        self._bloom = novo
+
+    def sincronizar(self):
+        """
+        Traz revogações novas do banco e descarta as expiradas (memória e banco)
+        """
+        agora = datetime.datetime.utcnow()
+        db = SessionLocal()
+        try:
+            consulta = db.query(TokenRevogado.jti, TokenRevogado.expira_em, TokenRevogado.revogado_em)\
+                .filter(TokenRevogado.expira_em > agora)
+            if self._ultima_sincronizacao is not None:
+                consulta = consulta.filter(
+                    TokenRevogado.revogado_em >= self._ultima_sincronizacao - REVOGACAO_MARGEM_SINCRONIZACAO
+                )
+            novos = consulta.all()
+
+            removidos = db.query(TokenRevogado).filter(TokenRevogado.expira_em <= agora)\
+                .delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+        with self._lock:
+            for jti, expira_em, revogado_em in novos:
+                self._adicionar(jti, expira_em)
+                if self._ultima_sincronizacao is None or revogado_em > self._ultima_sincronizacao:
+                    self._ultima_sincronizacao = revogado_em
+            if self._ultima_sincronizacao is None:
+                self._ultima_sincronizacao = agora
+
+            expirados = [jti for jti, expira_em in self._exatos.items() if expira_em <= agora]
+            for jti in expirados:
+                del self._exatos[jti]
+            if expirados or removidos:
+                self._reconstruir_bloom()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.sincronizar()
+            except Exception as e:
+                print(f"Erro ao sincronizar tokens revogados: {e}")
+
+    def iniciar(self):
+        """
+        Carrega as revogações vigentes e inicia a sincronização periódica
+        """
+        self.sincronizar()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="sincronizar-revogacoes", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.intervalo + 5)
+            self._thread = None
+
+
+# Instância única usada pela aplicação
+revogacao_tokens = RevogacaoTokens()
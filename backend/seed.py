@@ -4,12 +4,13 @@ Cria turmas e alunos para demonstração e testes
 """
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
-from models import Base, Turma, Aluno
+from migracoes import apagar_esquema, aplicar_migracoes
+from models import Turma, Aluno
 import datetime
 
 # Recria as tabelas
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+apagar_esquema(engine)
+aplicar_migracoes(engine)
 
 def criar_dados_exemplo():
     """
@@ -0,0 +1,287 @@
+"""
+Snapshot colunar em memória da tabela de alunos
+Mantém colunas em arrays, nomes de turma internados, bitmaps por status e
+uma lista de postagem (bitmap) por turma_id. Os filtros de GET /alunos são
+respondidos por interseção de bitmaps, sem consultar o SQLite.
+
+O snapshot é carregado na inicialização e atualizado pelas rotas de escrita de app.py.
+Como fica na memória de um único processo, só deve ser ativado com um worker
+(SNAPSHOT_ALUNOS=1); com vários workers as escritas de um não apareceriam nos outros
+"""
+import datetime
+import os
+import sys
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from database import MULTI_ESCOLA, SessionLocal, minusculas
+from models import Aluno, Turma
+
+# Ativa o snapshot (desligado por padrão, GET /alunos continua consultando o banco)
+# O snapshot guarda um único banco, por isso não é usado no modo multi-escola
+SNAPSHOT_ALUNOS_ATIVO = os.getenv("SNAPSHOT_ALUNOS", "0") == "1" and not MULTI_ESCOLA
+
+# Limites de memória: acima deles o snapshot se desativa e as consultas voltam ao SQL
+SNAPSHOT_MAX_ALUNOS = int(os.getenv("SNAPSHOT_MAX_ALUNOS", "200000"))
+SNAPSHOT_MAX_BYTES = int(os.getenv("SNAPSHOT_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Posições dos bits ligados em cada valor de byte (para percorrer bitmaps rapidamente)
+_BITS_DO_BYTE = [tuple(i for i in range(8) if (b >> i) & 1) for b in range(256)]
+
+
+def _posicoes(bitmap: int) -> List[int]:
+    """
+    Converte um bitmap (int) na lista ordenada de posições com bit ligado
+    """
+    if not bitmap:
+        return []
+    posicoes = []
+    dados = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    for indice, byte in enumerate(dados):
+        if byte:
+            base = indice * 8
+            posicoes.extend(base + bit for bit in _BITS_DO_BYTE[byte])
+    return posicoes
+
+
+class SnapshotAlunos:
+    """
+    Representação colunar dos alunos, uma posição (slot) por aluno
+    Alunos excluídos viram slots mortos até a próxima compactação
+    """
+
+    def __init__(self, max_alunos: int = SNAPSHOT_MAX_ALUNOS, max_bytes: int = SNAPSHOT_MAX_BYTES):
+        self.max_alunos = max_alunos
+        self.max_bytes = max_bytes
+        self.ativo = False
+        self._lock = threading.RLock()
+        self._limpar()
+
+    def _limpar(self):
+        # Colunas
+        self._ids = array("q")
+        self._nascimentos = array("i")   # data_nascimento em ordinal
+        self._turmas = array("q")        # turma_id, 0 quando sem turma
+        self._nomes: List[str] = []
+        self._nomes_busca: List[str] = []
+        self._emails: List[Optional[str]] = []
+        self._status: List[str] = []
+        # Índices
+        self._posicao_por_id: Dict[int, int] = {}
+        self._vivos = 0
+        self._bitmaps_status: Dict[str, int] = {}
+        self._postagens_turma: Dict[int, int] = {}
+        self._nomes_turma: Dict[int, str] = {}
+        self._ordenado = True
+
+    # === CARGA ===
+
+    def carregar(self):
+        """
+        Carrega o snapshot completo a partir do banco
+        """
+        db = SessionLocal()
+        try:
+            with self._lock:
+                self._limpar()
+                for turma_id, nome in db.query(Turma.id, Turma.nome):
+                    self._nomes_turma[turma_id] = sys.intern(nome)
+                colunas = (Aluno.id, Aluno.nome, Aluno.data_nascimento, Aluno.email, Aluno.status, Aluno.turma_id)
+                for linha in db.query(*colunas).order_by(Aluno.id).yield_per(1000):
+                    if len(self._ids) >= self.max_alunos:
+                        self._desativar(f"mais de {self.max_alunos} alunos")
+                        return
+                    self._inserir(*linha)
+                self.ativo = True
+                self._verificar_memoria()
+        finally:
+            db.close()
+
+    def _desativar(self, motivo: str):
+        print(f"Snapshot de alunos desativado: {motivo}")
+        self._limpar()
+        self.ativo = False
+
+    def _verificar_memoria(self):
+        if self.memoria_bytes() > self.max_bytes:
+            self._desativar(f"uso de memória acima de {self.max_bytes} bytes")
+
+    # === ATUALIZAÇÃO INCREMENTAL ===
+
+    def _inserir(self, aluno_id, nome, data_nascimento, email, status, turma_id):
+        posicao = len(self._ids)
+        if self._ids and aluno_id < self._ids[-1]:
+            self._ordenado = False
+        self._ids.append(aluno_id)
+        self._nascimentos.append(data_nascimento.toordinal())
+        self._turmas.append(turma_id or 0)
+        self._nomes.append(nome)
+        self._nomes_busca.append(minusculas(nome))
+        self._emails.append(email)
+        self._status.append(sys.intern(status))
+        self._posicao_por_id[aluno_id] = posicao
+
+        bit = 1 << posicao
+        self._vivos |= bit
+        self._bitmaps_status[status] = self._bitmaps_status.get(status, 0) | bit
+        if turma_id:
+            self._postagens_turma[turma_id] = self._postagens_turma.get(turma_id, 0) | bit
+
+    def _remover_indices(self, posicao: int):
+        mascara = ~(1 << posicao)
+        self._vivos &= mascara
+        status = self._status[posicao]
+        self._bitmaps_status[status] &= mascara
+        turma_id = self._turmas[posicao]
+        if turma_id:
+            self._postagens_turma[turma_id] &= mascara
+
+    def registrar_aluno(self, aluno: Aluno):
+        """
+        Insere ou atualiza um aluno após o commit de uma rota de escrita
+        """
+        if not self.ativo:
+            return
+        with self._lock:
+            posicao = self._posicao_por_id.get(aluno.id)
+            if posicao is None:
+                if len(self._posicao_por_id) >= self.max_alunos:
+                    self._desativar(f"mais de {self.max_alunos} alunos")
+                    return
+                self._inserir(aluno.id, aluno.nome, aluno.data_nascimento,
+                              aluno.email, aluno.status, aluno.turma_id)
+                if len(self._ids) % 1000 == 0:
+                    self._verificar_memoria()
+                return
+
+            self._remover_indices(posicao)
+            self._nascimentos[posicao] = aluno.data_nascimento.toordinal()
+            self._turmas[posicao] = aluno.turma_id or 0
+            self._nomes[posicao] = aluno.nome
+            self._nomes_busca[posicao] = minusculas(aluno.nome)
+            self._emails[posicao] = aluno.email
+            self._status[posicao] = sys.intern(aluno.status)
+
+            bit = 1 << posicao
+            self._vivos |= bit
+            self._bitmaps_status[aluno.status] = self._bitmaps_status.get(aluno.status, 0) | bit
+            if aluno.turma_id:
+                self._postagens_turma[aluno.turma_id] = self._postagens_turma.get(aluno.turma_id, 0) | bit
+
+    def remover_aluno(self, aluno_id: int):
+        """
+        Remove um aluno excluído do snapshot
+        """
+        if not self.ativo:
+            return
+        with self._lock:
+            posicao = self._posicao_por_id.pop(aluno_id, None)
+            if posicao is None:
+                return
+            self._remover_indices(posicao)
+            # Compacta quando metade dos slots estiver morta
+            if len(self._posicao_por_id) * 2 < len(self._ids):
+                self._compactar()
+
+    def registrar_turma(self, turma_id: int, nome: str):
+        """
+        Registra o nome de uma turma nova ou renomeada
+        """
+        if not self.ativo:
+            return
+        with self._lock:
+            self._nomes_turma[turma_id] = sys.intern(nome)
+
+    def _compactar(self):
+        """
+        Reconstrói as colunas apenas com os slots vivos, em ordem de id
+        """
+        vivos = sorted(_posicoes(self._vivos), key=lambda p: self._ids[p])
+        linhas = [
+            (self._ids[p], self._nomes[p], datetime.date.fromordinal(self._nascimentos[p]),
+             self._emails[p], self._status[p], self._turmas[p] or None)
+            for p in vivos
+        ]
+        nomes_turma = self._nomes_turma
+        self._limpar()
+        self._nomes_turma = nomes_turma
+        for linha in linhas:
+            self._inserir(*linha)
+
+    # === CONSULTA ===
+
+    def filtrar(self, search: Optional[str] = None, turma_id: Optional[int] = None,
+                status: Optional[str] = None) -> List[dict]:
+        """
+        Equivalente em memória aos filtros de GET /alunos (consultas.listar_alunos)
+        A busca é a mesma do SQL: substring literal sobre minusculas(nome)
+        """
+        with self._lock:
+            candidatos = self._vivos
+            if turma_id:
+                candidatos &= self._postagens_turma.get(turma_id, 0)
+            if status:
+                candidatos &= self._bitmaps_status.get(status, 0)
+            posicoes = _posicoes(candidatos)
+            if search:
+                termo = minusculas(search)
+                posicoes = [p for p in posicoes if termo in self._nomes_busca[p]]
+            if not self._ordenado:
+                posicoes.sort(key=lambda p: self._ids[p])
+            return [self._linha(p) for p in posicoes]
+
+    def _linha(self, posicao: int) -> dict:
+        nascimento = datetime.date.fromordinal(self._nascimentos[posicao])
+        hoje = datetime.date.today()
+        turma_id = self._turmas[posicao] or None
+        return {
+            "id": self._ids[posicao],
+            "nome": self._nomes[posicao],
+            "data_nascimento": nascimento,
+            "email": self._emails[posicao],
+            "status": self._status[posicao],
+            "turma_id": turma_id,
+            "idade": hoje.year - nascimento.year - ((hoje.month, hoje.day) < (nascimento.month, nascimento.day)),
+            "turma_nome": self._nomes_turma.get(turma_id) if turma_id else None,
+        }
+
+    # === MEDIÇÃO DE MEMÓRIA ===
+
+    def memoria_bytes(self) -> int:
+        """
+        Estimativa do uso de memória do snapshot (colunas, textos, índices e bitmaps)
+        Strings internadas (status e nomes de turma) são contadas uma única vez
+        """
+        with self._lock:
+            total = sum(sys.getsizeof(coluna) for coluna in (self._ids, self._nascimentos, self._turmas))
+            for lista in (self._nomes, self._nomes_busca, self._emails, self._status):
+                total += sys.getsizeof(lista)
+            total += sum(sys.getsizeof(nome) for nome in self._nomes)
+            total += sum(sys.getsizeof(nome) for nome in self._nomes_busca)
+            total += sum(sys.getsizeof(email) for email in self._emails if email is not None)
+            total += sys.getsizeof(self._posicao_por_id)
+            total += sys.getsizeof(self._vivos)
+            total += sum(sys.getsizeof(b) for b in self._bitmaps_status.values())
+            total += sum(sys.getsizeof(b) for b in self._postagens_turma.values())
+            total += sum(sys.getsizeof(nome) for nome in self._nomes_turma.values())
+            return total
+
+    def estatisticas(self) -> dict:
+        """
+        Resumo do snapshot para diagnóstico
+        """
+        with self._lock:
+            alunos = len(self._posicao_por_id)
+            memoria = self.memoria_bytes()
+            return {
+                "ativo": self.ativo,
+                "alunos": alunos,
+                "slots": len(self._ids),
+                "memoria_bytes": memoria,
+                "bytes_por_aluno": round(memoria / alunos, 1) if alunos else 0,
+            }
+
+
+# Instância única usada pela aplicação
+snapshot_alunos = SnapshotAlunos()
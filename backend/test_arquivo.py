@@ -0,0 +1,46 @@
+"""
+Testes do arquivamento: os alunos arquivados continuam listados pelo id original,
+então um aluno novo nunca recebe o id de um aluno arquivado ou excluído
+"""
+import datetime
+
+from arquivo import arquivar_inativos
+from database import SessionLocal
+from models import Aluno
+
+
+def _criar_aluno(cliente, usuarios, nome: str) -> int:
+    nascimento = (datetime.date.today() - datetime.timedelta(days=365 * 12)).isoformat()
+    resposta = cliente.post("/alunos", json={"nome": nome, "data_nascimento": nascimento},
+                            headers=usuarios["professor"])
+    assert resposta.status_code == 201
+    return resposta.json()["id"]
+
+
+def _inativar_ha_anos(aluno_id: int):
+    db = SessionLocal()
+    try:
+        db.query(Aluno).filter(Aluno.id == aluno_id).update({
+            "status": "inativo",
+            "turma_id": None,
+            "inativo_desde": datetime.date.today() - datetime.timedelta(days=365 * 5),
+        })
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_aluno_novo_nao_reaproveita_id_arquivado_nem_excluido(cliente, usuarios):
+    _criar_aluno(cliente, usuarios, "Beatriz Souza")
+    arquivado = _criar_aluno(cliente, usuarios, "Caio Nogueira")
+    _inativar_ha_anos(arquivado)
+    assert arquivar_inativos(anos=1, pausa=0)["arquivados"] >= 1
+
+    novo = _criar_aluno(cliente, usuarios, "Davi Moreira")
+    assert novo > arquivado
+    cliente.delete(f"/alunos/{novo}")
+    assert _criar_aluno(cliente, usuarios, "Elisa Prado") > novo
+
+    ids = [aluno["id"] for aluno in cliente.get("/alunos", params={"incluir_arquivo": True}).json()]
+    assert arquivado in ids
+    assert len(ids) == len(set(ids))
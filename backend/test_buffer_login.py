@@ -0,0 +1,76 @@
+"""
+Testes do buffer de ultimo_login: falha em uma escola não perde os logins das demais
+"""
+import datetime
+
+import pytest
+
+import buffer_login
+from buffer_login import BufferUltimoLogin
+from database import SessionLocal, escola_atual
+from models import Usuario
+
+
+def _registrar(buffer: BufferUltimoLogin, escola, usuario_id: int, momento: datetime.datetime):
+    token = escola_atual.set(escola)
+    try:
+        buffer.registrar(usuario_id, momento)
+    finally:
+        escola_atual.reset(token)
+
+
+def _ultimo_login(usuario_id: int):
+    db = SessionLocal()
+    try:
+        return db.get(Usuario, usuario_id).ultimo_login
+    finally:
+        db.close()
+
+
+def test_falha_em_uma_escola_mantem_pendentes_e_grava_as_demais(usuarios, monkeypatch):
+    db = SessionLocal()
+    try:
+        usuario_id = db.query(Usuario.id).filter(Usuario.username == "professor").scalar()
+    finally:
+        db.close()
+
+    obter_original = buffer_login.obter_sessionmaker
+
+    def obter_sessionmaker():
+        if escola_atual.get() is not None:
+            raise RuntimeError("banco da escola indisponível")
+        return obter_original()
+
+    monkeypatch.setattr(buffer_login, "obter_sessionmaker", obter_sessionmaker)
+
+    momento = datetime.datetime(2024, 3, 1, 8, 0, 0)
+    buffer = BufferUltimoLogin()
+    # A escola com falha vem antes do banco principal na ordem do flush
+    _registrar(buffer, "norte", 7, momento)
+    _registrar(buffer, "sul", 8, momento)
+    _registrar(buffer, None, usuario_id, momento)
+
+    with pytest.raises(RuntimeError, match="norte, sul"):
+        buffer.flush()
+
+    assert _ultimo_login(usuario_id) == momento
+    assert buffer._pendentes == {("norte", 7): momento, ("sul", 8): momento}
+
+
+def test_falha_nao_sobrescreve_login_mais_novo(monkeypatch):
+    antigo = datetime.datetime(2024, 3, 1, 8, 0, 0)
+    novo = antigo + datetime.timedelta(hours=1)
+    buffer = BufferUltimoLogin()
+    _registrar(buffer, "norte", 7, antigo)
+
+    def obter_sessionmaker():
+        # Um novo login chega enquanto o flush está em andamento
+        _registrar(buffer, "norte", 7, novo)
+        raise RuntimeError("banco da escola indisponível")
+
+    monkeypatch.setattr(buffer_login, "obter_sessionmaker", obter_sessionmaker)
+
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+
+    assert buffer._pendentes == {("norte", 7): novo}
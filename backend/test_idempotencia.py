@@ -0,0 +1,146 @@
+"""
+Testes do Idempotency-Key: repetição da resposta, corpo diferente (422), execução em
+andamento em outro processo (409), chaves por cliente e requisições simultâneas no processo
+"""
+import asyncio
+import datetime
+import json
+import uuid
+
+import httpx
+import pytest
+
+from auth import criar_access_token
+from database import SessionLocal
+from idempotencia import IdempotenciaMiddleware
+from models import RespostaIdempotente
+
+
+class RotaContada:
+    """
+    Rota POST /turmas falsa que conta quantas vezes foi executada
+    """
+
+    def __init__(self, espera: float = 0.0):
+        self.espera = espera
+        self.execucoes = 0
+
+    async def __call__(self, scope, receive, send):
+        mensagem = await receive()
+        self.execucoes += 1
+        execucao = self.execucoes
+        await asyncio.sleep(self.espera)
+        corpo = json.dumps({"execucao": execucao, "recebido": json.loads(mensagem["body"])}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 201,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(corpo)).encode())],
+        })
+        await send({"type": "http.response.body", "body": corpo})
+
+
+@pytest.fixture(autouse=True)
+def limpar_respostas(banco):
+    db = SessionLocal()
+    try:
+        db.query(RespostaIdempotente).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _autorizacao(username: str) -> dict:
+    return {"Authorization": f"Bearer {criar_access_token({'sub': username})}"}
+
+
+async def _post(app, corpo: dict, chave: str, cabecalhos: dict = None) -> httpx.Response:
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+        return await cliente.post("/turmas", json=corpo, headers={"Idempotency-Key": chave, **(cabecalhos or {})})
+
+
+def _enviar(app, corpo: dict, chave: str, cabecalhos: dict = None) -> httpx.Response:
+    return asyncio.run(_post(app, corpo, chave, cabecalhos))
+
+
+def test_repeticao_devolve_a_primeira_resposta_sem_executar_de_novo():
+    rota = RotaContada()
+    app = IdempotenciaMiddleware(rota)
+    chave = uuid.uuid4().hex
+
+    primeira = _enviar(app, {"nome": "1A"}, chave, _autorizacao("professor"))
+    segunda = _enviar(app, {"nome": "1A"}, chave, _autorizacao("professor"))
+
+    assert rota.execucoes == 1
+    assert segunda.status_code == primeira.status_code == 201
+    assert segunda.json() == primeira.json()
+    assert segunda.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in primeira.headers
+
+
+def test_mesma_chave_com_outro_corpo_retorna_422():
+    rota = RotaContada()
+    app = IdempotenciaMiddleware(rota)
+    chave = uuid.uuid4().hex
+
+    _enviar(app, {"nome": "1A"}, chave)
+    resposta = _enviar(app, {"nome": "2B"}, chave)
+
+    assert resposta.status_code == 422
+    assert rota.execucoes == 1
+
+
+def test_chave_em_execucao_em_outro_processo_retorna_409():
+    rota = RotaContada()
+    app = IdempotenciaMiddleware(rota)
+    chave = uuid.uuid4().hex
+    _enviar(app, {"nome": "1A"}, chave)
+
+    # Simula a reserva de outro processo que ainda não terminou de executar
+    db = SessionLocal()
+    try:
+        db.query(RespostaIdempotente).update({
+            "status": None,
+            "corpo": None,
+            "expira_em": datetime.datetime.utcnow() + datetime.timedelta(seconds=60),
+        })
+        db.commit()
+    finally:
+        db.close()
+
+    resposta = _enviar(IdempotenciaMiddleware(rota), {"nome": "1A"}, chave)
+
+    assert resposta.status_code == 409
+    assert resposta.headers["retry-after"] == "1"
+    assert rota.execucoes == 1
+
+
+def test_mesma_chave_de_outro_cliente_nao_repete_a_resposta():
+    rota = RotaContada()
+    app = IdempotenciaMiddleware(rota)
+    chave = uuid.uuid4().hex
+
+    professor = _enviar(app, {"nome": "1A"}, chave, _autorizacao("professor"))
+    diretora = _enviar(app, {"nome": "1A"}, chave, _autorizacao("diretora"))
+    anonimo = _enviar(app, {"nome": "1A"}, chave)
+
+    assert rota.execucoes == 3
+    assert [r.json()["execucao"] for r in (professor, diretora, anonimo)] == [1, 2, 3]
+    assert all("idempotent-replayed" not in r.headers for r in (diretora, anonimo))
+
+
+def test_requisicoes_simultaneas_no_processo_esperam_e_reaproveitam_a_primeira():
+    rota = RotaContada(espera=0.2)
+    app = IdempotenciaMiddleware(rota)
+    chave = uuid.uuid4().hex
+    cabecalhos = _autorizacao("professor")
+
+    async def simultaneas():
+        return await asyncio.gather(*(_post(app, {"nome": "1A"}, chave, cabecalhos) for _ in range(3)))
+
+    respostas = asyncio.run(simultaneas())
+
+    assert rota.execucoes == 1
+    assert {r.status_code for r in respostas} == {201}
+    assert {r.json()["execucao"] for r in respostas} == {1}
+    assert sum(r.headers.get("idempotent-replayed") == "true" for r in respostas) == 2
@@ -0,0 +1,225 @@
+"""
+Testes da fila de jobs: reserva, expiração do lease, retentativas e permissão do POST /jobs
+"""
+import datetime
+import json
+from concurrent.futures import Future
+
+import pytest
+
+from database import SessionLocal
+from jobs import FilaJobs, _executar_handler, registrar_job, submeter_job
+from models import Job, Usuario
+
+
+@registrar_job("teste_eco")
+def job_teste_eco(job_id: int, parametros: dict) -> dict:
+    return parametros
+
+
+@pytest.fixture
+def fila():
+    """
+    Fila sem despachante (os testes chamam a reserva e a finalização diretamente)
+    """
+    db = SessionLocal()
+    try:
+        db.query(Job).delete()
+        db.commit()
+    finally:
+        db.close()
+    return FilaJobs(workers=1)
+
+
+def _job(job_id: int) -> Job:
+    db = SessionLocal()
+    try:
+        return db.get(Job, job_id)
+    finally:
+        db.close()
+
+
+def _alterar(job_id: int, **valores):
+    db = SessionLocal()
+    try:
+        db.query(Job).filter(Job.id == job_id).update(valores)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _futuro(resultado=None, erro: Exception = None) -> Future:
+    futuro = Future()
+    if erro is not None:
+        futuro.set_exception(erro)
+    else:
+        futuro.set_result(resultado)
+    return futuro
+
+
+def _expirar_lease(job_id: int):
+    _alterar(job_id, lease_ate=datetime.datetime.utcnow() - datetime.timedelta(seconds=1))
+
+
+# === RESERVA E LEASE ===
+
+def test_reserva_marca_executando_e_nao_entrega_o_job_duas_vezes(fila):
+    job = submeter_job("teste_eco", {"x": 1})
+
+    reservado = fila._reservar()
+
+    assert reservado[0] == job.id
+    reservado_job = _job(job.id)
+    assert reservado_job.status == "executando"
+    assert reservado_job.tentativas == 1
+    assert reservado_job.lease_ate > datetime.datetime.utcnow()
+    assert fila._reservar() is None
+
+
+def test_lease_expirado_volta_a_ser_reservado(fila):
+    job = submeter_job("teste_eco", {})
+    fila._reservar()
+    _expirar_lease(job.id)
+
+    reservado = fila._reservar()
+
+    assert reservado[0] == job.id
+    assert _job(job.id).tentativas == 2
+
+
+def test_lease_expirado_sem_tentativas_restantes_marca_falhou(fila):
+    job = submeter_job("teste_eco", {})
+    fila._reservar()
+    _alterar(job.id, tentativas=3)
+    _expirar_lease(job.id)
+
+    assert fila._reservar() is None
+    falhou = _job(job.id)
+    assert falhou.status == "falhou"
+    assert "Lease expirado" in falhou.erro
+
+
+# === FINALIZAÇÃO E RETENTATIVAS ===
+
+def test_sucesso_grava_resultado(fila):
+    job = submeter_job("teste_eco", {"turma": "1A"})
+    reservado = fila._reservar()
+
+    fila._finalizar(job.id, reservado[4], _futuro(_executar_handler(*reservado[:4])))
+
+    concluido = _job(job.id)
+    assert concluido.status == "concluido"
+    assert concluido.progresso == 100
+    assert json.loads(concluido.resultado) == {"turma": "1A"}
+    assert concluido.lease_ate is None
+
+
+def test_erro_volta_para_pendente_ate_esgotar_as_tentativas(fila):
+    job = submeter_job("teste_eco", {})
+
+    for tentativa in range(1, 4):
+        assert fila._reservar()[0::4] == (job.id, tentativa)
+        fila._finalizar(job.id, tentativa, _futuro(erro=RuntimeError(f"falha {tentativa}")))
+        estado = _job(job.id)
+        assert estado.tentativas == tentativa
+        assert estado.erro == f"falha {tentativa}"
+        assert estado.status == ("falhou" if tentativa == 3 else "pendente")
+
+    assert fila._reservar() is None
+
+
+@pytest.mark.parametrize("resultado_atrasado", [
+    {"erro": RuntimeError("atrasado")},
+    {"resultado": json.dumps({"worker": "a"})},
+])
+def test_tentativa_atrasada_nao_altera_job_retomado_por_outro_worker(fila, resultado_atrasado):
+    worker_b = FilaJobs(workers=1)
+    job = submeter_job("teste_eco", {})
+    _, _, _, _, tentativa_a = fila._reservar()
+    _expirar_lease(job.id)
+    _, _, _, _, tentativa_b = worker_b._reservar()
+    worker_b._em_execucao[job.id] = tentativa_b
+    lease_b = _job(job.id).lease_ate
+
+    # O worker A termina depois de perder o lease (com erro ou com sucesso)
+    fila._finalizar(job.id, tentativa_a, _futuro(**resultado_atrasado))
+    fila._em_execucao[job.id] = tentativa_a
+    fila._renovar_leases()
+
+    estado = _job(job.id)
+    assert (estado.status, estado.tentativas, estado.resultado) == ("executando", 2, None)
+    assert estado.lease_ate == lease_b
+    assert fila._reservar() is None
+
+    worker_b._finalizar(job.id, tentativa_b, _futuro(json.dumps({"worker": "b"})))
+    assert json.loads(_job(job.id).resultado) == {"worker": "b"}
+
+
+def test_mesma_chave_de_idempotencia_devolve_o_mesmo_job(fila):
+    primeiro = submeter_job("teste_eco", {}, chave_idempotencia="exportacao-1")
+    segundo = submeter_job("teste_eco", {}, chave_idempotencia="exportacao-1")
+
+    assert segundo.id == primeiro.id
+
+
+# === PERMISSÃO DO POST /jobs ===
+
+@pytest.mark.parametrize("tipo", ["backup", "arquivar_alunos"])
+def test_usuario_comum_nao_submete_job_administrativo(fila, cliente, usuarios, tipo):
+    resposta = cliente.post("/jobs", json={"tipo": tipo}, headers=usuarios["professor"])
+
+    assert resposta.status_code == 403
+    assert fila._reservar() is None
+
+
+def test_administrador_submete_job_administrativo(fila, cliente, usuarios):
+    resposta = cliente.post("/jobs", json={"tipo": "arquivar_alunos"}, headers=usuarios["diretora"])
+
+    assert resposta.status_code == 202
+    assert resposta.json()["tipo"] == "arquivar_alunos"
+
+
+def test_usuario_comum_submete_job_publico(fila, cliente, usuarios):
+    resposta = cliente.post("/jobs", json={"tipo": "estatisticas"}, headers=usuarios["professor"])
+
+    assert resposta.status_code == 202
+
+
+def test_tipo_desconhecido_e_rejeitado(fila, cliente, usuarios):
+    resposta = cliente.post("/jobs", json={"tipo": "inexistente"}, headers=usuarios["professor"])
+
+    assert resposta.status_code == 400
+
+
+# === LEITURA DE JOBS (GET /jobs/{id}) ===
+
+def _id_usuario(username: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Usuario.id).filter(Usuario.username == username).scalar()
+    finally:
+        db.close()
+
+
+def _concluir(fila: FilaJobs, job_id: int):
+    reservado = fila._reservar()
+    assert reservado[0] == job_id
+    fila._finalizar(job_id, reservado[4], _futuro(json.dumps({"ok": True})))
+
+
+def test_usuario_comum_nao_le_job_de_outro_usuario(fila, cliente, usuarios):
+    job = submeter_job("arquivar_alunos", {}, _id_usuario("diretora"))
+    _concluir(fila, job.id)
+
+    for caminho in (f"/jobs/{job.id}", f"/jobs/{job.id}/resultado"):
+        assert cliente.get(caminho, headers=usuarios["professor"]).status_code == 404
+        assert cliente.get(caminho, headers=usuarios["diretora"]).status_code == 200
+
+
+def test_usuario_le_o_proprio_job_e_administrador_le_todos(fila, cliente, usuarios):
+    job = submeter_job("teste_eco", {}, _id_usuario("professor"))
+    _concluir(fila, job.id)
+
+    for cabecalhos in (usuarios["professor"], usuarios["diretora"]):
+        assert cliente.get(f"/jobs/{job.id}", headers=cabecalhos).json()["status"] == "concluido"
+        assert cliente.get(f"/jobs/{job.id}/resultado", headers=cabecalhos).json() == {"ok": True}
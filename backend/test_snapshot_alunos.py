@@ -0,0 +1,88 @@
+"""
+Testes do snapshot de alunos: os filtros em memória devem devolver o mesmo que o SQL
+de consultas.listar_alunos depois de cada tipo de escrita das rotas
+"""
+import datetime
+
+import pytest
+
+import consultas
+from database import SessionLocal
+from models import Aluno, Turma
+from snapshot_alunos import snapshot_alunos
+
+BUSCAS = [None, "joão", "JOÃO", "ão", "ANA", "ana_", "_", "%", "100%", "/", "Ç", "x"]
+STATUS = [None, "ativo", "inativo"]
+
+
+@pytest.fixture
+def snapshot(banco):
+    db = SessionLocal()
+    try:
+        db.query(Aluno).delete()
+        db.query(Turma).delete()
+        db.commit()
+    finally:
+        db.close()
+    snapshot_alunos.carregar()
+    yield snapshot_alunos
+    snapshot_alunos.ativo = False
+    snapshot_alunos._limpar()
+
+
+def _via_sql(search, turma_id, status):
+    db = SessionLocal()
+    try:
+        return [
+            (a.id, a.nome, a.status, a.turma_id, a.turma.nome if a.turma else None)
+            for a in consultas.listar_alunos(db, search, turma_id, status)
+        ]
+    finally:
+        db.close()
+
+
+def _via_snapshot(snapshot, search, turma_id, status):
+    return [
+        (a["id"], a["nome"], a["status"], a["turma_id"], a["turma_nome"])
+        for a in snapshot.filtrar(search, turma_id, status)
+    ]
+
+
+def _comparar(snapshot, turmas):
+    for search in BUSCAS:
+        for turma_id in [None, *turmas]:
+            for status in STATUS:
+                esperado = _via_sql(search, turma_id, status)
+                assert _via_snapshot(snapshot, search, turma_id, status) == esperado, (search, turma_id, status)
+
+
+def test_snapshot_igual_ao_sql_apos_cada_escrita(snapshot, cliente, usuarios):
+    nascimento = (datetime.date.today() - datetime.timedelta(days=365 * 10)).isoformat()
+    turma = cliente.post("/turmas", json={"nome": "Turma Ç", "capacidade": 30}).json()["id"]
+    outra = cliente.post("/turmas", json={"nome": "Turma B", "capacidade": 30}).json()["id"]
+    turmas = [turma, outra]
+
+    ids = []
+    for nome in ["João Silva", "JOÃO PEDRO", "Ana_Maria", "Anabela", "Maria 100% Ação", "Luíza/Çanto"]:
+        resposta = cliente.post("/alunos", json={"nome": nome, "data_nascimento": nascimento},
+                                headers=usuarios["professor"])
+        assert resposta.status_code == 201
+        ids.append(resposta.json()["id"])
+    _comparar(snapshot, turmas)
+
+    # Atualização do nome, do status e da turma
+    cliente.put(f"/alunos/{ids[3]}", json={"nome": "ANAÏS Ramos", "status": "ativo", "turma_id": outra})
+    _comparar(snapshot, turmas)
+
+    # Matrícula
+    for aluno_id in ids[:3]:
+        assert cliente.post("/matriculas", json={"aluno_id": aluno_id, "turma_id": turma}).status_code == 200
+    _comparar(snapshot, turmas)
+
+    # Exclusão
+    cliente.delete(f"/alunos/{ids[0]}")
+    cliente.delete(f"/alunos/{ids[4]}")
+    _comparar(snapshot, turmas)
+
+    assert _via_snapshot(snapshot, "JOÃO", None, None) == _via_sql("joão", None, None) != []
+    assert [linha[1] for linha in _via_sql("_", None, None)] == ["Ana_Maria"]
@@ -13,6 +13,9 @@
 // ===== CONFIGURAÇÃO DA API =====
 const API_BASE_URL = 'http://localhost:8001';
 
+// Escola usada no modo multi-escola do backend (MULTI_ESCOLA=1); vazio no modo de escola única
+const ESCOLA_ID = '';
+
 // ===== ESTADO DA APLICAÇÃO =====
 let appState = {
     alunos: [],
@@ -30,6 +33,20 @@ let appState = {
 
 // ===== UTILITÁRIOS =====
 
+// Tentativas de um POST em caso de falha de rede (seguro graças à Idempotency-Key)
+const MAX_TENTATIVAS_POST = 3;
+
+/**
+ * Gera uma chave única para o cabeçalho Idempotency-Key
+ * @returns {string} - Chave aleatória
+ */
+function gerarChaveIdempotencia() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
 /**
  * Faz requisição HTTP para a API
  * @param {string} url - URL do endpoint
@@ -50,16 +67,41 @@ async function apiRequest(url, options = {}) {
             headers['Authorization'] = `Bearer ${appState.token}`;
         }
         
-        const controller = new AbortController();
-        const timeoutId = setTimeout(() => controller.abort(), 10000); // 10 segundos timeout
+        if (ESCOLA_ID) {
+            headers['X-Escola'] = ESCOLA_ID;
+        }
         
-        const response = await fetch(`${API_BASE_URL}${url}`, {
-            headers,
-            signal: controller.signal,
-            ...options
-        });
+        // POSTs levam uma Idempotency-Key: as novas tentativas reutilizam a mesma chave
+        // e o servidor devolve a resposta da primeira execução em vez de repetir a operação
+        const metodo = (options.method || 'GET').toUpperCase();
+        if (metodo === 'POST' && !url.startsWith('/auth/')) {
+            headers['Idempotency-Key'] = gerarChaveIdempotencia();
+        }
+        const maxTentativas = headers['Idempotency-Key'] ? MAX_TENTATIVAS_POST : 1;
+        
+        let response;
+        for (let tentativa = 1; ; tentativa++) {
+            const controller = new AbortController();
+            const timeoutId = setTimeout(() => controller.abort(), 10000); // 10 segundos timeout
+            
+            try {
+                response = await fetch(`${API_BASE_URL}${url}`, {
+                    ...options,
+                    headers,
+                    signal: controller.signal
+                });
+                clearTimeout(timeoutId);
+                break;
+            } catch (erroRede) {
+                clearTimeout(timeoutId);
+                if (tentativa >= maxTentativas) {
+                    throw erroRede;
+                }
+                console.log(`🔁 Repetindo requisição (tentativa ${tentativa + 1})`);
+                await new Promise(resolve => setTimeout(resolve, 500 * tentativa));
+            }
+        }
         
-        clearTimeout(timeoutId);
         console.log(`📡 Response Status: ${response.status}`, response); // Debug log
 
         // Se token expirou, redireciona para login
@@ -218,6 +260,19 @@ async function login(username, senha) {
  * Realiza logout do usuário
  */
 function logout() {
+    // Revoga o token no servidor (sem aguardar a resposta)
+    const token = appState.token;
+    if (token) {
+        const headers = { 'Authorization': `Bearer ${token}` };
+        if (ESCOLA_ID) {
+            headers['X-Escola'] = ESCOLA_ID;
+        }
+        fetch(`${API_BASE_URL}/auth/logout`, {
+            method: 'POST',
+            headers
+        }).catch(() => {});
+    }
+    
     appState.token = null;
     appState.usuario = null;
     localStorage.removeItem('auth_token');
@@ -266,8 +321,9 @@ function mostrarLogin() {
 
 /**
  * Mostra a aplicação principal
+ * @param {boolean} dadosCarregados - Se turmas e alunos já vieram do batch inicial
  */
-function mostrarApp() {
+function mostrarApp(dadosCarregados = false) {
     document.getElementById('login-screen').classList.add('hidden');
     document.getElementById('main-app').classList.remove('hidden');
     
@@ -277,7 +333,7 @@ function mostrarApp() {
     }
     
     // Inicializa dados da aplicação
-    inicializarApp();
+    inicializarApp(dadosCarregados);
 }
 
 /**
@@ -496,6 +552,91 @@ function handleModalKeydown(e) {
 
 // ===== OPERAÇÕES DE DADOS =====
 
+/**
+ * Monta a URL de listagem de alunos com os filtros atuais
+ * @returns {string} - URL do endpoint
+ */
+function montarUrlAlunos() {
+    const params = new URLSearchParams();
+    if (appState.filtros.search) params.append('search', appState.filtros.search);
+    if (appState.filtros.turma_id) params.append('turma_id', appState.filtros.turma_id);
+    if (appState.filtros.status) params.append('status', appState.filtros.status);
+
+    const queryString = params.toString();
+    return queryString ? `/alunos?${queryString}` : '/alunos';
+}
+
+/**
+ * Carrega perfil, turmas e alunos em uma única requisição (POST /batch)
+ * Só falhas de autenticação do perfil são lançadas (sessão inválida); turmas ou alunos
+ * que falharem no batch (ex.: 429 no limite da rota) são recarregados separadamente
+ * @returns {Promise<Array<Function>>} - Funções de carga das partes que falharam
+ */
+async function carregarDadosIniciais() {
+    let resposta;
+    try {
+        resposta = await apiRequest('/batch', {
+            method: 'POST',
+            body: JSON.stringify({
+                requisicoes: [
+                    { id: 'perfil', url: '/auth/me' },
+                    { id: 'turmas', url: '/turmas' },
+                    { id: 'alunos', url: montarUrlAlunos() }
+                ]
+            })
+        });
+    } catch (error) {
+        // Batch indisponível: segue o fluxo sem batch (perfil, depois turmas e alunos)
+        console.warn('Batch inicial falhou, carregando separadamente:', error);
+        await obterPerfil();
+        appState.turmas = [];
+        appState.alunos = [];
+        return [loadTurmas, loadAlunos];
+    }
+    
+    if (!resposta) {
+        throw new Error('Sessão expirada');
+    }
+    
+    const resultados = {};
+    resposta.respostas.forEach(item => {
+        resultados[item.id] = item;
+    });
+    
+    const perfil = resultados.perfil;
+    if (perfil.status === 401) {
+        throw new Error('Sessão expirada');
+    }
+    if (perfil.status === 200) {
+        appState.usuario = perfil.body;
+        localStorage.setItem('user_data', JSON.stringify(perfil.body));
+    } else {
+        await obterPerfil();
+    }
+    
+    const recarregar = [];
+    const falhas = [];
+    if (resultados.turmas.status === 200) {
+        appState.turmas = resultados.turmas.body;
+    } else {
+        appState.turmas = [];
+        recarregar.push(loadTurmas);
+        falhas.push('turmas');
+    }
+    if (resultados.alunos.status === 200) {
+        appState.alunos = resultados.alunos.body;
+    } else {
+        appState.alunos = [];
+        recarregar.push(loadAlunos);
+        falhas.push('alunos');
+    }
+    if (falhas.length > 0) {
+        showToast(`Não foi possível carregar ${falhas.join(' e ')} de uma vez; carregando novamente...`, 'warning');
+    }
+    
+    return recarregar;
+}
+
 /**
  * Carregar lista de alunos da API
  */
@@ -503,15 +644,7 @@ async function loadAlunos() {
     try {
         showLoading('alunos');
         
-        const params = new URLSearchParams();
-        if (appState.filtros.search) params.append('search', appState.filtros.search);
-        if (appState.filtros.turma_id) params.append('turma_id', appState.filtros.turma_id);
-        if (appState.filtros.status) params.append('status', appState.filtros.status);
-
-        const queryString = params.toString();
-        const url = queryString ? `/alunos?${queryString}` : '/alunos';
-        
-        appState.alunos = await apiRequest(url);
+        appState.alunos = await apiRequest(montarUrlAlunos());
         
         // Aplicar ordenação
         sortAlunos(appState.ordenacao);
@@ -550,12 +683,16 @@ async function loadTurmas() {
  */
 async function createAluno(alunoData) {
     try {
-        await apiRequest('/alunos', {
+        const aluno = await apiRequest('/alunos', {
             method: 'POST',
             body: JSON.stringify(alunoData)
         });
 
         showToast('Aluno criado com sucesso!', 'success');
+        if (aluno && aluno.possiveis_duplicados && aluno.possiveis_duplicados.length > 0) {
+            const nomes = aluno.possiveis_duplicados.map(d => `${sanitizeHTML(d.nome)} (#${Number(d.id)})`).join(', ');
+            showToast(`Possível duplicado: já existe aluno com a mesma data de nascimento e nome parecido: ${nomes}`, 'warning', 10000);
+        }
         closeModal('modal-aluno');
         loadAlunos();
         
@@ -1284,9 +1421,10 @@ async function initApp() {
         // Verifica se há token armazenado
         if (appState.token) {
             try {
-                // Tenta obter dados do usuário
-                await obterPerfil();
-                mostrarApp();
+                // Obtém perfil, turmas e alunos em uma única ida ao servidor
+                const recarregar = await carregarDadosIniciais();
+                mostrarApp(true);
+                recarregar.forEach(carregar => carregar());
                 return;
             } catch (error) {
                 // Token inválido, remove e mostra login
@@ -1308,19 +1446,29 @@ async function initApp() {
 
 /**
  * Inicializa a aplicação principal (após login)
+ * @param {boolean} dadosCarregados - Se turmas e alunos já estão no estado
  */
-async function inicializarApp() {
+async function inicializarApp(dadosCarregados = false) {
     try {
         console.log('🔄 Carregando dados da aplicação...');
         
         // Configurar event listeners da app principal
         initEventListeners();
         
-        // Carregar dados iniciais
-        await Promise.all([
-            loadAlunos(),
-            loadTurmas()
-        ]);
+        if (dadosCarregados) {
+            // Dados já obtidos pelo batch inicial, apenas renderiza
+            sortAlunos(appState.ordenacao);
+            renderAlunos();
+            renderTurmas();
+            updateTurmaSelects();
+            updateStatistics();
+        } else {
+            // Carregar dados iniciais
+            await Promise.all([
+                loadAlunos(),
+                loadTurmas()
+            ]);
+        }
         
         console.log('✅ Aplicação carregada com sucesso!');
         